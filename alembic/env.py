@@ -14,6 +14,8 @@ if config.config_file_name is not None:
 from user_management.models.base import Base
 from user_management.models.role import Role
 from user_management.models.user import User
+from user_management.models.weather import Weather
+from user_management.models.refresh_token import RefreshToken
 
 
 target_metadata = Base.metadata
@@ -0,0 +1,50 @@
+"""Время наблюдения и составной индекс (city, observed_at DESC) для weather
+
+Revision ID: 3c9a7e1f5b20
+Revises: 6d8a1dfad8a1
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c9a7e1f5b20'
+down_revision: Union[str, None] = '6d8a1dfad8a1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    inspector = sa.inspect(op.get_bind())
+    # Таблица weather раньше создавалась через create_all, поэтому в истории миграций её может не быть
+    if not inspector.has_table('weather'):
+        op.create_table('weather',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('city', sa.String(), nullable=False),
+        sa.Column('temperature', sa.Float(), nullable=False),
+        sa.Column('humidity', sa.Integer(), nullable=False),
+        sa.Column('description', sa.String(), nullable=False),
+        sa.Column('observed_at', sa.DateTime(timezone=True), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_weather_id'), 'weather', ['id'], unique=False)
+    else:
+        # Существующие строки получают текущее время через server_default
+        with op.batch_alter_table('weather') as batch_op:
+            batch_op.add_column(sa.Column('observed_at', sa.DateTime(timezone=True), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=False))
+        if 'ix_weather_city' in {index['name'] for index in inspector.get_indexes('weather')}:
+            op.drop_index('ix_weather_city', table_name='weather')
+    op.create_index('ix_weather_city_observed_at', 'weather', ['city', sa.text('observed_at DESC')], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_weather_city_observed_at', table_name='weather')
+    op.create_index('ix_weather_city', 'weather', ['city'], unique=False)
+    with op.batch_alter_table('weather') as batch_op:
+        batch_op.drop_column('observed_at')
@@ -0,0 +1,256 @@
+"""
+Нагрузочный бенчмарк эндпоинтов auth, users и weather.
+
+Засевает локальную SQLite-базу N пользователями и M записями погоды, гоняет
+приложение in-process (ASGI) и/или через настоящий сокет uvicorn с заданной
+конкурентностью и печатает p50/p95/p99, запросы в секунду и SQL-запросы на запрос.
+
+Примеры:
+    python -m benchmarks.bench --users 1000 --weather 5000 --requests 500 --concurrency 20
+    python -m benchmarks.bench --mode socket --save-baseline benchmarks/baseline.json
+    python -m benchmarks.bench --compare benchmarks/baseline.json --tolerance 0.2
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import sys
+import tempfile
+import time
+
+# База и настройки задаются до импорта приложения, так как Settings читаются при импорте
+_db_dir = tempfile.mkdtemp(prefix="um-bench-")
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{_db_dir}/bench.db")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+
+from user_management.auth.security import get_password_hash  # noqa: E402
+from user_management.dependencies import dispose_database, get_engine  # noqa: E402
+from user_management.main import app  # noqa: E402
+from user_management.metrics import db_queries_per_request  # noqa: E402
+from user_management.models.base import Base  # noqa: E402
+from user_management.models.user import User  # noqa: E402
+from user_management.models.weather import Weather, utcnow  # noqa: E402
+
+PASSWORD = "bench-password"
+CITIES = ["Moscow", "London", "Paris", "Berlin", "Tokyo", "Madrid", "Rome", "Oslo"]
+
+
+async def seed(users: int, weather: int) -> None:
+    """
+    Создаёт таблицы и заливает пользователей и погоду пачками.
+    Хэш пароля считается один раз и переиспользуется для всех пользователей.
+    """
+    engine = get_engine()
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    hashed = get_password_hash(PASSWORD)
+    async with engine.begin() as conn:
+        for start in range(0, users, 1000):
+            await conn.execute(insert(User), [
+                {
+                    "email": f"user{i}@bench.local",
+                    "username": f"user{i}",
+                    "hashed_password": hashed,
+                    "is_active": True,
+                    "is_superuser": False,
+                    "is_verified": True,
+                }
+                for i in range(start, min(start + 1000, users))
+            ])
+        now = utcnow()
+        for start in range(0, weather, 1000):
+            await conn.execute(insert(Weather), [
+                {
+                    "city": CITIES[i % len(CITIES)],
+                    "temperature": random.uniform(-20, 35),
+                    "humidity": random.randint(10, 100),
+                    "description": "bench",
+                    "observed_at": now,
+                }
+                for i in range(start, min(start + 1000, weather))
+            ])
+
+
+def percentile(sorted_values, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def run_scenario(client: httpx.AsyncClient, name: str, make_request, route: str, total: int, concurrency: int) -> dict:
+    """
+    Выполняет total запросов с ограниченной конкурентностью и собирает статистику.
+    """
+    latencies = []
+    errors = 0
+    queries_before = db_queries_per_request.totals(route)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            response = await make_request(client, i)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    elapsed = time.perf_counter() - started
+    queries_after = db_queries_per_request.totals(route)
+    requests_seen = queries_after[1] - queries_before[1]
+    latencies.sort()
+    return {
+        "scenario": name,
+        "requests": total,
+        "errors": errors,
+        "rps": total / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "mean_ms": statistics.fmean(latencies) * 1000 if latencies else 0.0,
+        "queries_per_request": (queries_after[0] - queries_before[0]) / requests_seen if requests_seen else 0.0,
+    }
+
+
+async def login(client: httpx.AsyncClient, users: int, i: int = 0) -> httpx.Response:
+    return await client.post("/auth/token", data={
+        "username": f"user{i % users}@bench.local",
+        "password": PASSWORD,
+    })
+
+
+async def run_all(client: httpx.AsyncClient, args) -> list:
+    token = (await login(client, args.users)).json()["access_token"]
+    cookies = {"bonds": token}
+    scenarios = [
+        ("login", lambda c, i: login(c, args.users, i), "/auth/token", args.login_requests),
+        ("users_me", lambda c, i: c.get("/users/me", cookies=cookies), "/users/me", args.requests),
+        ("users_list", lambda c, i: c.get("/users/", params={"limit": 100}, cookies=cookies), "/users/", args.requests),
+        ("weather_get", lambda c, i: c.get(f"/weather/{CITIES[i % len(CITIES)]}"), "/weather/{city}", args.requests),
+    ]
+    results = []
+    for name, make_request, route, total in scenarios:
+        if args.only and name not in args.only:
+            continue
+        results.append(await run_scenario(client, name, make_request, route, total, args.concurrency))
+    return results
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def run_socket(args) -> list:
+    """
+    Поднимает uvicorn на свободном порту в том же процессе и гоняет сценарии через TCP.
+    """
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="off"))
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits) as client:
+            return await run_all(client, args)
+    finally:
+        server.should_exit = True
+        await task
+
+
+async def run_inprocess(args) -> list:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        return await run_all(client, args)
+
+
+def print_results(mode: str, results: list) -> None:
+    print(f"\n[{mode}]")
+    print(f"{'scenario':<12} {'req':>6} {'err':>4} {'rps':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'q/req':>6}")
+    for r in results:
+        print(
+            f"{r['scenario']:<12} {r['requests']:>6} {r['errors']:>4} {r['rps']:>9.1f} "
+            f"{r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} {r['p99_ms']:>8.2f} {r['queries_per_request']:>6.2f}"
+        )
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list:
+    """
+    Сравнивает p95 и rps с базовой линией; возвращает список регрессий.
+    """
+    regressions = []
+    for mode, results in report.items():
+        base = {r["scenario"]: r for r in baseline.get(mode, [])}
+        for r in results:
+            b = base.get(r["scenario"])
+            if b is None:
+                continue
+            if r["p95_ms"] > b["p95_ms"] * (1 + tolerance):
+                regressions.append(f"{mode}/{r['scenario']}: p95 {b['p95_ms']:.2f} -> {r['p95_ms']:.2f} ms")
+            if r["rps"] < b["rps"] * (1 - tolerance):
+                regressions.append(f"{mode}/{r['scenario']}: rps {b['rps']:.1f} -> {r['rps']:.1f}")
+            # Доли запроса — шум от прогрева кэшей, регрессия — это лишний SQL-запрос на каждый вызов
+            if r["queries_per_request"] > b["queries_per_request"] + 0.5:
+                regressions.append(
+                    f"{mode}/{r['scenario']}: queries/request {b['queries_per_request']:.2f} -> {r['queries_per_request']:.2f}"
+                )
+    return regressions
+
+
+async def main(args) -> int:
+    await seed(args.users, args.weather)
+    report = {}
+    if args.mode in ("inprocess", "both"):
+        report["inprocess"] = await run_inprocess(args)
+        print_results("inprocess", report["inprocess"])
+    if args.mode in ("socket", "both"):
+        report["socket"] = await run_socket(args)
+        print_results("socket", report["socket"])
+    await dispose_database()
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nБазовая линия сохранена в {args.save_baseline}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if regressions:
+            print("\nРегрессии относительно базовой линии:")
+            for line in regressions:
+                print("  " + line)
+            return 1
+        print("\nРегрессий относительно базовой линии нет")
+    return 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000, help="Сколько пользователей засеять")
+    parser.add_argument("--weather", type=int, default=5000, help="Сколько записей погоды засеять")
+    parser.add_argument("--requests", type=int, default=500, help="Запросов на сценарий")
+    parser.add_argument("--login-requests", type=int, default=50, help="Запросов на сценарий login (bcrypt дорогой)")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--mode", choices=("inprocess", "socket", "both"), default="both")
+    parser.add_argument("--only", nargs="*", help="Запустить только указанные сценарии")
+    parser.add_argument("--save-baseline", help="Сохранить результаты в JSON-файл")
+    parser.add_argument("--compare", help="Сравнить с сохранённой базовой линией")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Допустимое ухудшение (доля)")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(parse_args())))
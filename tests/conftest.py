@@ -1,4 +1,3 @@
-import os
 import pytest
 import asyncio
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
@@ -9,11 +8,8 @@ from user_management.main import app
 
 @pytest.fixture(scope="session", autouse=True)
 def create_test_db():
-    # Выбор базы данных для тестов: SQLite при TESTING=1, иначе основная
-    if os.environ.get("TESTING") == "1":
-        db_url = settings.SQL_DATABASE_URL
-    else:
-        db_url = settings.DATABASE_URL
+    # Выбор базы данных для тестов: SQLite при TESTING=1, иначе основная (как у приложения)
+    db_url = settings.get_database_url()
     engine = create_async_engine(db_url, future=True)
     async_session_maker = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
     async def override_get_db():
@@ -36,10 +32,7 @@ def create_test_db():
 
 @pytest.fixture()
 async def db_session():
-    if os.environ.get("TESTING") == "1":
-        db_url = settings.SQL_DATABASE_URL
-    else:
-        db_url = settings.DATABASE_URL
+    db_url = settings.get_database_url()
     engine = create_async_engine(db_url, future=True)
     async_session_maker = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
     async with async_session_maker() as session:
@@ -0,0 +1,56 @@
+"""
+Локальная заглушка API OpenWeather для тестов: настоящий HTTP-сервер uvicorn
+в отдельном потоке, отвечающий на /data/2.5/weather с задержкой.
+"""
+import asyncio
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+import uvicorn
+from fastapi import FastAPI, HTTPException
+
+KNOWN_CITIES = {"Stubville": (21.5, 40, "clear sky")}
+
+
+def create_stub_app(delay: float = 0.0) -> FastAPI:
+    app = FastAPI()
+    app.state.calls = []
+
+    @app.get("/data/2.5/weather")
+    async def current_weather(q: str, appid: str = "", units: str = "standard"):
+        app.state.calls.append(q)
+        await asyncio.sleep(delay)
+        if q not in KNOWN_CITIES:
+            raise HTTPException(status_code=404, detail="city not found")
+        temperature, humidity, description = KNOWN_CITIES[q]
+        return {
+            "name": q,
+            "dt": int(time.time()),
+            "main": {"temp": temperature, "humidity": humidity},
+            "weather": [{"description": description}],
+        }
+
+    return app
+
+
+@contextmanager
+def run_stub_server(delay: float = 0.0):
+    """
+    Запускает заглушку на свободном порту; отдаёт (base_url, stub_app).
+    """
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    stub_app = create_stub_app(delay)
+    server = uvicorn.Server(uvicorn.Config(stub_app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    try:
+        yield f"http://127.0.0.1:{port}", stub_app
+    finally:
+        server.should_exit = True
+        thread.join(timeout=5)
@@ -0,0 +1,227 @@
+import re
+import uuid
+import pytest
+from sqlalchemy import select, update
+from datetime import datetime, timedelta, timezone
+from fastapi import HTTPException, Request
+from httpx import AsyncClient
+from user_management.main import app
+from user_management.auth.auth import create_access_token, decode_access_token, get_current_principal, token_cache
+from user_management.auth.revocation import current_token_version, revoke_user_tokens
+from user_management.auth.manager import UserManager, create_user, user_cache
+from user_management.auth.refresh import issue_refresh_token, purge_expired_refresh_tokens
+from user_management.auth.schemas import UserCreate
+from user_management.models.refresh_token import RefreshToken
+from user_management.models.user import User
+from user_management.auth.security import (
+    PasswordService, get_dummy_password_hash, get_password_hash_async, password_service,
+    verify_password_async, verify_password_or_dummy,
+)
+from user_management.config import settings
+from user_management.dependencies import async_session_maker
+
+
+def test_decode_access_token_uses_cache():
+    token_cache.clear()
+    token = create_access_token(data={"sub": "1"})
+    hits = token_cache.hits
+    assert decode_access_token(token)["sub"] == "1"
+    assert decode_access_token(token)["sub"] == "1"
+    assert token_cache.hits == hits + 1
+
+
+def test_decode_access_token_rejects_invalid_and_expired():
+    token_cache.clear()
+    assert decode_access_token("not-a-token") is None
+    expired = create_access_token(data={"sub": "1"}, expires_delta=timedelta(seconds=-10))
+    assert decode_access_token(expired) is None
+    assert len(token_cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_password_hashing_runs_in_pool():
+    hashed = await get_password_hash_async("secret")
+    assert await verify_password_async("secret", hashed)
+    assert not await verify_password_async("wrong", hashed)
+
+
+@pytest.mark.asyncio
+async def test_register_duplicate_returns_400():
+    suffix = uuid.uuid4().hex[:8]
+    payload = {"email": f"dup{suffix}@example.com", "username": f"dup{suffix}", "password": "secret", "full_name": None}
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        first = await ac.post("/auth/register", json=payload)
+        same_email = await ac.post("/auth/register", json={**payload, "username": f"other{suffix}"})
+        same_username = await ac.post("/auth/register", json={**payload, "email": f"other{suffix}@example.com"})
+    assert first.status_code == 200
+    assert same_email.status_code == 400
+    assert same_username.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_create_user_reports_non_unique_integrity_errors_as_500():
+    suffix = uuid.uuid4().hex[:8]
+    # username NOT NULL: такая ошибка не должна выглядеть как «email уже занят»
+    user_data = UserCreate.model_construct(
+        email=f"nulluser{suffix}@example.com", username=None, password="secret", full_name=None,
+    )
+    with pytest.raises(HTTPException) as error:
+        await create_user(user_data)
+    assert error.value.status_code == 500
+
+
+@pytest.mark.asyncio
+async def test_get_current_principal_trusts_claims_and_honors_revocation():
+    user = User(id=424242, is_active=True, is_superuser=False, role_id=7)
+    token = create_access_token(data={"sub": str(user.id)}, principal=user)
+    request = Request({"type": "http", "headers": [(b"cookie", f"bonds={token}".encode())]})
+    principal = await get_current_principal(request)
+    assert (principal.id, principal.is_active, principal.role_id) == (424242, True, 7)
+
+    revoke_user_tokens(user.id)
+    with pytest.raises(HTTPException) as exc:
+        await get_current_principal(request)
+    assert exc.value.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_logout_denylists_token_jti():
+    user = User(id=434343, is_active=True, is_superuser=False, role_id=None)
+    token = create_access_token(data={"sub": str(user.id)}, principal=user)
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        before = await ac.get("/users/", params={"limit": 1}, cookies={"bonds": token})
+        logout = await ac.post("/auth/logout", cookies={"bonds": token})
+        after = await ac.get("/users/", params={"limit": 1}, cookies={"bonds": token})
+    assert before.status_code == 200
+    assert logout.status_code == 204
+    assert after.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_profile_update_revokes_tokens_only_for_sensitive_fields():
+    manager = UserManager(user_db=None)
+    user = User(id=454545)
+    await manager.on_after_update(user, {"full_name": "New Name"})
+    assert current_token_version(user.id) == 0
+    await manager.on_after_update(user, {"is_active": False})
+    assert current_token_version(user.id) == 1
+
+
+@pytest.mark.asyncio
+async def test_refresh_token_rotation_and_reuse_detection():
+    suffix = uuid.uuid4().hex[:8]
+    payload = {"email": f"ref{suffix}@example.com", "username": f"ref{suffix}", "password": "secret", "full_name": None}
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        assert (await ac.post("/auth/register", json=payload)).status_code == 200
+        login = await ac.post("/auth/token", data={"username": payload["email"], "password": "secret"})
+        assert login.status_code == 200
+        first = login.json()["refresh_token"]
+
+        rotated = await ac.post("/auth/refresh", json={"refresh_token": first})
+        assert rotated.status_code == 200
+        second = rotated.json()["refresh_token"]
+        assert second != first
+        assert decode_access_token(rotated.json()["access_token"])["sub"]
+
+        # Повтор старого токена отзывает всю цепочку, включая уже выданный новый
+        assert (await ac.post("/auth/refresh", json={"refresh_token": first})).status_code == 401
+        assert (await ac.post("/auth/refresh", json={"refresh_token": second})).status_code == 401
+        assert (await ac.post("/auth/refresh", json={"refresh_token": "unknown"})).status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_refresh_for_inactive_user_revokes_family_without_rotation():
+    suffix = uuid.uuid4().hex[:8]
+    payload = {"email": f"inact{suffix}@example.com", "username": f"inact{suffix}", "password": "secret", "full_name": None}
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        user_id = (await ac.post("/auth/register", json=payload)).json()["user"]["id"]
+        refresh_token = (await ac.post("/auth/token", data={"username": payload["email"], "password": "secret"})).json()["refresh_token"]
+        async with async_session_maker() as session:
+            await session.execute(update(User).where(User.id == user_id).values(is_active=False))
+            await session.commit()
+        user_cache.invalidate(user_id)
+        response = await ac.post("/auth/refresh", json={"refresh_token": refresh_token})
+    assert response.status_code == 401
+    async with async_session_maker() as session:
+        rows = (await session.execute(
+            select(RefreshToken.revoked_at).where(RefreshToken.user_id == user_id)
+        )).all()
+    assert len(rows) == 1 and rows[0].revoked_at is not None
+
+
+@pytest.mark.asyncio
+async def test_purge_expired_refresh_tokens():
+    async with async_session_maker() as session:
+        user_id = (await session.execute(select(User.id).limit(1))).scalar_one()
+        now = datetime.now(timezone.utc)
+        for _ in range(3):
+            await issue_refresh_token(session, user_id)
+        await session.commit()
+        assert await purge_expired_refresh_tokens(session, now=now + timedelta(days=365), batch_size=2) >= 3
+        remaining = (await session.execute(
+            select(RefreshToken.id).where(RefreshToken.expires_at <= now + timedelta(days=365))
+        )).all()
+    assert remaining == []
+
+
+@pytest.mark.asyncio
+async def test_stateless_login_reads_user_with_one_query(monkeypatch):
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+    monkeypatch.setattr(settings, "STATELESS_TOKENS_ENABLED", True)
+    suffix = uuid.uuid4().hex[:8]
+    payload = {"email": f"one{suffix}@example.com", "username": f"one{suffix}", "password": "secret", "full_name": None}
+    user_queries = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if re.match(r'\s*SELECT\b.*\bFROM "?user"?(\s|$)', statement, re.S):
+            user_queries.append(statement)
+
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        user_id = (await ac.post("/auth/register", json=payload)).json()["user"]["id"]
+        user_cache.invalidate(user_id)
+        event.listen(Engine, "before_cursor_execute", record)
+        try:
+            login = await ac.post("/auth/token", data={"username": payload["email"], "password": "secret"})
+        finally:
+            event.remove(Engine, "before_cursor_execute", record)
+    assert login.status_code == 200
+    assert len(user_queries) == 1
+    claims = decode_access_token(login.json()["access_token"])
+    assert (claims["uid"], claims["act"], claims["su"]) == (user_id, True, False)
+
+
+def test_password_service_marks_weaker_hashes_outdated():
+    legacy = PasswordService("bcrypt", bcrypt_rounds=4).hash("secret")
+    service = PasswordService("argon2", argon2_time_cost=1, argon2_memory_cost=1024, argon2_parallelism=1)
+    assert service.needs_update(legacy)
+    verified, new_hash = service.verify_and_update("secret", legacy)
+    assert verified and new_hash.startswith("$argon2")
+    assert not service.needs_update(new_hash)
+    assert service.verify_and_update("wrong", legacy) == (False, None)
+
+
+@pytest.mark.asyncio
+async def test_login_rehashes_outdated_password_hash():
+    suffix = uuid.uuid4().hex[:8]
+    email = f"rehash{suffix}@example.com"
+    legacy = PasswordService("bcrypt", bcrypt_rounds=4).hash("secret")
+    async with async_session_maker() as session:
+        session.add(User(email=email, username=f"rehash{suffix}", hashed_password=legacy,
+                         is_active=True, is_superuser=False, is_verified=True))
+        await session.commit()
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        response = await ac.post("/auth/token", data={"username": email, "password": "secret"})
+    assert response.status_code == 200
+    async with async_session_maker() as session:
+        stored = (await session.execute(select(User.hashed_password).where(User.email == email))).scalar_one()
+    assert stored != legacy
+    assert not password_service.needs_update(stored)
+
+
+@pytest.mark.asyncio
+async def test_unknown_email_pays_for_dummy_verify(monkeypatch):
+    calls = []
+    monkeypatch.setattr(password_service, "verify", lambda plain, hashed: calls.append(hashed) or False)
+    assert await verify_password_or_dummy("secret", None) == (False, None)
+    assert calls == [await get_dummy_password_hash()]
@@ -0,0 +1,47 @@
+import uuid
+import pytest
+from user_management.auth.bulk_import import import_users, insert_users, iter_file_lines, parse_rows
+
+
+@pytest.mark.asyncio
+async def test_import_users_from_csv_reports_row_errors(db_session):
+    suffix = uuid.uuid4().hex[:8]
+    lines = [
+        "email,username,password,full_name",
+        f"a{suffix}@example.com,a{suffix},secret,User A",
+        f"not-an-email,b{suffix},secret,",
+        f"a{suffix}@example.com,c{suffix},secret,",
+        f"d{suffix}@example.com,d{suffix},secret,",
+    ]
+    async for session in db_session:
+        report = await import_users(session, parse_rows(iter_file_lines(lines), "csv"), chunk_size=2)
+        assert report["received"] == 4
+        assert report["created"] == 2
+        assert [error["index"] for error in report["errors"]] == [1, 2]
+
+        again = await import_users(session, parse_rows(iter_file_lines(lines[:2]), "csv"))
+        assert again["created"] == 0
+        assert again["failed"] == 1
+        break
+
+
+@pytest.mark.asyncio
+async def test_insert_users_reports_constraint_failures_per_row(db_session):
+    suffix = uuid.uuid4().hex[:8]
+    base = {"hashed_password": "x", "is_active": True, "is_superuser": False, "is_verified": True}
+    rows = [
+        (0, {**base, "email": f"ok{suffix}@example.com", "username": f"ok{suffix}"}),
+        (1, {**base, "email": f"null{suffix}@example.com", "username": None}),
+    ]
+    async for session in db_session:
+        errors = await insert_users(session, rows)
+        assert errors == [(1, "Не удалось сохранить строку")]
+        break
+
+
+@pytest.mark.asyncio
+async def test_parse_rows_ndjson():
+    lines = ['{"email": "x@example.com"}', "oops", ""]
+    rows = [row async for row in parse_rows(iter_file_lines(lines), "ndjson")]
+    assert rows[0] == (0, {"email": "x@example.com"})
+    assert rows[1] == (1, "Некорректный JSON")
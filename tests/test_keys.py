@@ -0,0 +1,59 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+import jwt
+import pytest
+from httpx import AsyncClient
+
+from user_management.auth import keys
+from user_management.auth.keys import Keyring
+from user_management.main import app
+
+
+def write_keyring(tmp_path, entries):
+    path = tmp_path / "keyring.json"
+    for entry in entries:
+        keys.main([str(path), "--kid", entry["kid"], "--alg", entry["alg"],
+                   *(["--not-before", entry["not_before"]] if entry.get("not_before") else [])])
+    return str(path)
+
+
+def test_keyring_rotates_by_schedule_and_verifies_old_tokens(tmp_path):
+    now = datetime.now(timezone.utc)
+    path = write_keyring(tmp_path, [
+        {"kid": "old", "alg": "ES256", "not_before": (now - timedelta(days=30)).isoformat()},
+        {"kid": "current", "alg": "EdDSA", "not_before": (now - timedelta(days=1)).isoformat()},
+        {"kid": "next", "alg": "ES256", "not_before": (now + timedelta(days=1)).isoformat()},
+    ])
+    keyring = Keyring.from_file(path)
+    assert keyring.signing_key().kid == "current"
+    assert keyring.signing_key(now + timedelta(days=2)).kid == "next"
+
+    token = keyring.encode({"sub": "1", "aud": "fastapi-users:auth"})
+    assert jwt.get_unverified_header(token)["kid"] == "current"
+    assert keyring.decode(token, audience="fastapi-users:auth")["sub"] == "1"
+
+    forged = jwt.encode({"sub": "1", "aud": "fastapi-users:auth"}, "secret", algorithm="HS256", headers={"kid": "current"})
+    with pytest.raises(jwt.PyJWTError):
+        keyring.decode(forged, audience="fastapi-users:auth")
+
+    jwks = json.loads(keyring.jwks_body)
+    assert {key["kid"] for key in jwks["keys"]} == {"old", "current", "next"}
+    assert all("d" not in key for key in jwks["keys"])
+
+
+def test_symmetric_keyring_publishes_no_keys():
+    keyring = Keyring.from_secret("secret", "HS256")
+    token = keyring.encode({"sub": "1", "aud": "fastapi-users:auth"})
+    assert keyring.decode(token, audience="fastapi-users:auth")["sub"] == "1"
+    assert json.loads(keyring.jwks_body) == {"keys": []}
+
+
+@pytest.mark.asyncio
+async def test_jwks_endpoint_has_cache_headers():
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        response = await ac.get("/.well-known/jwks.json")
+        assert response.status_code == 200
+        assert "max-age" in response.headers["cache-control"]
+        cached = await ac.get("/.well-known/jwks.json", headers={"If-None-Match": response.headers["etag"]})
+    assert cached.status_code == 304
@@ -0,0 +1,36 @@
+import pytest
+from httpx import AsyncClient
+
+from user_management import dependencies
+from user_management.auth.security import PasswordService
+from user_management.config import settings
+from user_management.main import app
+from user_management.metrics import app_startup_seconds
+
+
+def test_password_service_builds_context_lazily():
+    service = PasswordService(bcrypt_rounds=4)
+    assert service._context is None
+    assert service.verify("secret", service.hash("secret"))
+    assert service._context is not None
+
+
+@pytest.mark.asyncio
+async def test_init_database_prewarms_pool_connections():
+    assert await dependencies.init_database(prewarm=3) == 3
+    assert dependencies.get_engine().pool.checkedin() >= 3
+
+
+@pytest.mark.asyncio
+async def test_lifespan_prewarms_and_disposes(monkeypatch):
+    monkeypatch.setattr(settings, "DB_POOL_PREWARM", 2)
+    async with app.router.lifespan_context(app):
+        assert dependencies._engine is not None
+        assert dependencies.get_engine().pool.checkedin() >= 2
+        async with AsyncClient(app=app, base_url="http://test") as ac:
+            response = await ac.get("/test")
+        assert response.status_code == 200
+    assert app_startup_seconds.value("total") > 0
+    assert app_startup_seconds.value("lifespan") <= app_startup_seconds.value("total")
+    # После остановки engine закрыт; следующее обращение создаёт новый
+    assert dependencies._engine is None
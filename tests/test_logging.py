@@ -0,0 +1,33 @@
+import json
+import logging
+from user_management.logging_config import DebugSamplingFilter, DeferredQueueHandler, JsonFormatter
+
+
+def make_record(level, msg="message %s", args=("arg",)):
+    return logging.LogRecord("test", level, __file__, 1, msg, args, None)
+
+
+def test_json_formatter_outputs_single_json_line():
+    line = JsonFormatter().format(make_record(logging.INFO))
+    data = json.loads(line)
+    assert data["message"] == "message arg"
+    assert data["level"] == "INFO"
+
+
+def test_debug_sampling_filter_keeps_other_levels():
+    sampling = DebugSamplingFilter(rate=0.0)
+    assert not sampling.filter(make_record(logging.DEBUG))
+    assert sampling.filter(make_record(logging.INFO))
+    assert DebugSamplingFilter(rate=1.0).filter(make_record(logging.DEBUG))
+
+
+def test_deferred_handler_snapshots_mutable_args_only():
+    handler = DeferredQueueHandler(None)
+    scalars = handler.prepare(make_record(logging.INFO, "user %s: %d", ("a", 1)))
+    assert scalars.args == ("a", 1)
+
+    payload = {"state": "before"}
+    record = handler.prepare(make_record(logging.INFO, "payload %r", (payload,)))
+    payload["state"] = "after"
+    assert record.args is None
+    assert record.getMessage() == "payload {'state': 'before'}"
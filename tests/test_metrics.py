@@ -0,0 +1,38 @@
+import pytest
+from httpx import AsyncClient
+from user_management.main import app
+from user_management.metrics import Histogram
+
+
+def test_histogram_render_is_cumulative():
+    histogram = Histogram("latency_seconds", "test", ("route",), buckets=(0.1, 1.0))
+    histogram.observe(0.05, "/a")
+    histogram.observe(0.5, "/a")
+    histogram.observe(5, "/a")
+    lines = histogram.render()
+    assert 'latency_seconds_bucket{route="/a",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{route="/a",le="1.0"} 2' in lines
+    assert 'latency_seconds_bucket{route="/a",le="+Inf"} 3' in lines
+    assert 'latency_seconds_count{route="/a"} 3' in lines
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint_reports_routes():
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        await ac.get("/test")
+        response = await ac.get("/metrics")
+    assert response.status_code == 200
+    assert 'http_requests_total{method="GET",route="/test",status="200"}' in response.text
+    assert "http_request_duration_seconds_bucket" in response.text
+    assert 'cache_hits_total{cache="weather"}' in response.text
+
+
+@pytest.mark.asyncio
+async def test_pool_collector_is_not_duplicated_after_engine_rebuild():
+    from user_management.dependencies import dispose_database, get_engine
+    get_engine()
+    await dispose_database()
+    get_engine()
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        response = await ac.get("/metrics")
+    assert response.text.count("# TYPE db_pool_checked_out gauge") == 1
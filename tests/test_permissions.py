@@ -0,0 +1,52 @@
+import pytest
+from fastapi import HTTPException
+from user_management.auth.permissions import RoleIndex, parse_permissions, require_permission, role_index
+from user_management.models.role import Role
+from user_management.models.user import User
+
+
+def test_parse_permissions_accepts_list_and_dict():
+    assert parse_permissions(["users:read", "users:write"]) == {"users:read", "users:write"}
+    assert parse_permissions({"users:read": True, "users:write": False}) == {"users:read"}
+    assert parse_permissions(None) == frozenset()
+
+
+def test_role_index_lookup():
+    index = RoleIndex()
+    index.load([(1, ["weather:write"]), (2, None)])
+    assert index.has_permissions(1, frozenset({"weather:write"}))
+    assert not index.has_permissions(2, frozenset({"weather:write"}))
+    assert not index.has_permissions(None, frozenset({"weather:write"}))
+
+
+@pytest.mark.asyncio
+async def test_require_permission_dependency():
+    role_index.set(99, ["reports:read"])
+    dependency = require_permission("reports:read")
+    allowed = User(id=1, role_id=99, is_superuser=False, is_active=True)
+    assert await dependency(current_user=allowed) is allowed
+    superuser = User(id=2, role_id=None, is_superuser=True, is_active=True)
+    assert await dependency(current_user=superuser) is superuser
+    with pytest.raises(HTTPException) as exc:
+        await dependency(current_user=User(id=3, role_id=None, is_superuser=False, is_active=True))
+    assert exc.value.status_code == 403
+    with pytest.raises(HTTPException) as exc:
+        await dependency(current_user=User(id=4, role_id=None, is_superuser=True, is_active=False))
+    assert exc.value.status_code == 401
+    role_index.remove(99)
+
+
+@pytest.mark.asyncio
+async def test_role_changes_refresh_index_on_commit(db_session):
+    async for session in db_session:
+        role = Role(name="editor", permissions=["weather:write"])
+        session.add(role)
+        await session.commit()
+        assert role_index.permissions(role.id) == {"weather:write"}
+        role.permissions = ["weather:write", "weather:delete"]
+        await session.commit()
+        assert role_index.permissions(role.id) == {"weather:write", "weather:delete"}
+        await session.delete(role)
+        await session.commit()
+        assert role_index.permissions(role.id) == frozenset()
+        break
@@ -0,0 +1,44 @@
+import uuid
+
+import pytest
+from httpx import AsyncClient
+
+from user_management.auth.rate_limit import InMemoryRateLimitBackend, login_limiter
+from user_management.config import settings
+from user_management.main import app
+from user_management.metrics import login_rate_limit_decisions
+
+
+@pytest.mark.asyncio
+async def test_backoff_grows_exponentially_and_resets():
+    backend = InMemoryRateLimitBackend(window=60, backoff_base=1, backoff_max=3)
+    assert await backend.add_failure("k", limit=2) == 0
+    assert await backend.add_failure("k", limit=2) == 1
+    assert await backend.retry_after("k") > 0
+    assert await backend.add_failure("k", limit=2) == 2
+    assert await backend.add_failure("k", limit=2) == 3
+    await backend.reset("k")
+    assert await backend.retry_after("k") == 0
+
+
+@pytest.mark.asyncio
+async def test_backend_is_bounded_by_maxsize():
+    backend = InMemoryRateLimitBackend(window=60, backoff_base=1, backoff_max=3, maxsize=2)
+    for key in ("a", "b", "c"):
+        await backend.add_failure(key, limit=10)
+    assert len(backend) == 2
+
+
+@pytest.mark.asyncio
+async def test_login_is_rejected_before_password_check():
+    email = f"nobody{uuid.uuid4().hex[:8]}@example.com"
+    rejected_before = login_rate_limit_decisions.value("account", "rejected")
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        for _ in range(settings.LOGIN_RATE_LIMIT_PER_ACCOUNT):
+            response = await ac.post("/auth/token", data={"username": email, "password": "wrong"})
+            assert response.status_code == 401
+        response = await ac.post("/auth/token", data={"username": email, "password": "wrong"})
+    assert response.status_code == 429
+    assert int(response.headers["retry-after"]) >= 1
+    assert login_rate_limit_decisions.value("account", "rejected") == rejected_before + 1
+    await login_limiter.backend.reset("ip:127.0.0.1")
@@ -0,0 +1,107 @@
+import pytest
+from httpx import AsyncClient
+from user_management.main import app
+from user_management.auth.auth import create_access_token
+from user_management.dependencies import async_session_maker, get_db
+from user_management.models.user import User
+
+
+def principal_cookies(user_id: int = 515151) -> dict:
+    # Stateless-токен: get_current_principal проверяет его без запроса к БД
+    principal = User(id=user_id, is_active=True, is_superuser=False, role_id=None)
+    return {"bonds": create_access_token(data={"sub": str(user_id)}, principal=principal)}
+
+
+@pytest.mark.asyncio
+async def test_get_users_keyset_pagination(db_session):
+    async for session in db_session:
+        users = [
+            User(email=f"page{i}@example.com", username=f"page{i}", hashed_password="x",
+                 is_active=True, is_superuser=False, is_verified=i != 1)
+            for i in range(3)
+        ]
+        session.add_all(users)
+        await session.flush()
+        ids = [user.id for user in users]
+
+        async def override_get_db():
+            yield session
+        app.dependency_overrides[get_db] = override_get_db
+        async with AsyncClient(app=app, base_url="http://test", cookies=principal_cookies()) as ac:
+            first = await ac.get("/users/", params={"after": ids[0] - 1, "limit": 2})
+            second = await ac.get("/users/", params={"after": first.headers["X-Next-After"], "limit": 2})
+            verified = await ac.get("/users/", params={"after": ids[0] - 1, "is_verified": False})
+        assert [user["id"] for user in first.json()] == ids[:2]
+        assert [user["id"] for user in second.json()] == ids[2:]
+        assert "X-Next-After" not in second.headers
+        assert [user["id"] for user in verified.json()] == [ids[1]]
+        assert "hashed_password" not in first.json()[0]
+        break
+    # Закрываем генератор, чтобы откатить транзакцию и снять блокировку SQLite
+    await db_session.aclose()
+
+
+@pytest.mark.asyncio
+async def test_get_users_ndjson_stream():
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        anonymous = await ac.get("/users/", params={"stream": True})
+        response = await ac.get("/users/", params={"stream": True}, cookies=principal_cookies())
+    assert anonymous.status_code == 401
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+
+@pytest.mark.asyncio
+async def test_users_me_and_register_use_user_read():
+    import uuid
+    suffix = uuid.uuid4().hex[:8]
+    payload = {"email": f"me{suffix}@example.com", "username": f"me{suffix}", "password": "secret", "full_name": "Me"}
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        registered = await ac.post("/auth/register", json=payload)
+        token = (await ac.post("/auth/token", data={"username": payload["email"], "password": "secret"})).json()["access_token"]
+        me = await ac.get("/users/me", cookies={"bonds": token})
+    assert "hashed_password" not in registered.json()["user"]
+    assert me.status_code == 200
+    assert me.json() == {**registered.json()["user"], "full_name": "Me"}
+    assert set(me.json()) == {"id", "email", "username", "full_name", "is_active", "is_superuser", "is_verified"}
+
+
+@pytest.mark.asyncio
+async def test_users_me_returns_stored_email_without_revalidation():
+    import uuid
+    suffix = uuid.uuid4().hex[:8]
+    # Такие адреса засевает benchmarks/bench.py; EmailStr отвергает домен .local
+    async with async_session_maker() as session:
+        user = User(email=f"user{suffix}@bench.local", username=f"bench{suffix}", hashed_password="x",
+                    is_active=True, is_superuser=False, is_verified=True)
+        session.add(user)
+        await session.commit()
+    token = create_access_token(data={"sub": str(user.id)})
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        me = await ac.get("/users/me", cookies={"bonds": token})
+    assert me.status_code == 200
+    assert me.json()["email"] == f"user{suffix}@bench.local"
+
+
+def test_fast_json_response_renders_with_orjson():
+    from datetime import datetime, timezone
+    import orjson
+    from user_management.responses import FastJSONResponse
+    content = {"id": 1, "at": datetime(2026, 1, 1, tzinfo=timezone.utc)}
+    assert FastJSONResponse(content).body == orjson.dumps(content)
+
+
+@pytest.mark.asyncio
+async def test_users_me_rejects_inactive_user_with_legacy_token():
+    import uuid
+    suffix = uuid.uuid4().hex[:8]
+    async with async_session_maker() as session:
+        user = User(email=f"gone{suffix}@example.com", username=f"gone{suffix}", hashed_password="x",
+                    is_active=False, is_superuser=False, is_verified=True)
+        session.add(user)
+        await session.commit()
+    # Токен без claims ver/uid: отзыв по версии к нему неприменим
+    token = create_access_token(data={"sub": str(user.id)})
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        me = await ac.get("/users/me", cookies={"bonds": token})
+    assert me.status_code == 401
@@ -36,4 +36,225 @@ async def test_get_weather(db_session):
             response = await ac.get("/weather/Test City")
         assert response.status_code == 200
         assert response.json()["city"] == "Test City"
-        break
\ No newline at end of file
+        break
+
+@pytest.mark.asyncio
+async def test_get_weather_served_from_cache(db_session):
+    async for session in db_session:
+        async def override_get_db():
+            yield session
+        app.dependency_overrides[get_db] = override_get_db
+        async with AsyncClient(app=app, base_url="http://test") as ac:
+            await ac.post("/weather/", json={
+                "city": "Cache City",
+                "temperature": 10.0,
+                "humidity": 40,
+                "description": "Cloudy"
+            })
+            hits = (await ac.get("/weather/cache/stats")).json()["hits"]
+            response = await ac.get("/weather/Cache City")
+            stats = (await ac.get("/weather/cache/stats")).json()
+        assert response.status_code == 200
+        assert response.json()["temperature"] == 10.0
+        assert stats["hits"] == hits + 1
+        break
+
+
+@pytest.mark.asyncio
+async def test_create_weather_bulk(db_session):
+    async for session in db_session:
+        async def override_get_db():
+            yield session
+        app.dependency_overrides[get_db] = override_get_db
+        rows = [
+            {"city": "Bulk A", "temperature": 1.0, "humidity": 10, "description": "Snow"},
+            {"city": "Bulk B", "temperature": "cold", "humidity": 10, "description": "Snow"},
+            {"city": "Bulk C", "temperature": 3.0, "humidity": 30, "description": "Rain"},
+        ]
+        async with AsyncClient(app=app, base_url="http://test") as ac:
+            response = await ac.post("/weather/bulk", json=rows)
+            ndjson = "\n".join([
+                '{"city": "Bulk A", "temperature": 5.0, "humidity": 50, "description": "Sun"}',
+                '{"city": "Bulk D", "temperature": 4.0, "humidity": 40, "description": "Fog"}',
+                'not json',
+            ])
+            upserted = await ac.post(
+                "/weather/bulk",
+                params={"upsert": True},
+                content=ndjson,
+                headers={"Content-Type": "application/x-ndjson"},
+            )
+            latest = await ac.get("/weather/Bulk A")
+        result = response.json()
+        assert (result["received"], result["inserted"], result["failed"]) == (3, 2, 1)
+        assert result["errors"][0]["index"] == 1
+        result = upserted.json()
+        assert (result["inserted"], result["updated"], result["failed"]) == (1, 1, 1)
+        assert latest.json()["temperature"] == 5.0
+        break
+
+
+@pytest.mark.asyncio
+async def test_bulk_upsert_updates_newest_observation(db_session):
+    async for session in db_session:
+        async def override_get_db():
+            yield session
+        app.dependency_overrides[get_db] = override_get_db
+        city = "Upsert Backfill"
+        async with AsyncClient(app=app, base_url="http://test") as ac:
+            # Вторая строка догружена задним числом: id больше, но наблюдение старше
+            for hour in (12, 10):
+                await ac.post("/weather/", json={
+                    "city": city, "temperature": float(hour), "humidity": 50,
+                    "description": "Clear", "observed_at": f"2026-02-01T{hour}:00:00+00:00",
+                })
+            rows = [
+                {"city": city, "temperature": 20.0, "humidity": 50, "description": "Sun",
+                 "observed_at": "2026-02-01T13:00:00+00:00"},
+                {"city": city, "temperature": 21.0, "humidity": 50, "description": "Sun",
+                 "observed_at": "2026-02-01T14:00:00+00:00"},
+            ]
+            response = await ac.post("/weather/bulk", params={"upsert": True}, json=rows)
+            # Более старое наблюдение в пачке идёт последним, но не побеждает более новое;
+            # наблюдение старше сохранённого уходит в историю, не затирая текущее
+            late = [
+                {"city": city, "temperature": 30.0, "humidity": 50, "description": "Sun",
+                 "observed_at": "2026-02-01T16:00:00+00:00"},
+                {"city": city, "temperature": 29.0, "humidity": 50, "description": "Sun",
+                 "observed_at": "2026-02-01T15:00:00+00:00"},
+            ]
+            newest = await ac.post("/weather/bulk", params={"upsert": True}, json=late)
+            backfill = await ac.post("/weather/bulk", params={"upsert": True}, json=[
+                {"city": city, "temperature": 11.0, "humidity": 50, "description": "Clear",
+                 "observed_at": "2026-02-01T11:00:00+00:00"},
+            ])
+            history = await ac.get(f"/weather/{city}/history")
+        result = response.json()
+        assert (result["inserted"], result["updated"], result["collapsed"]) == (0, 1, 1)
+        assert (newest.json()["updated"], newest.json()["collapsed"]) == (1, 1)
+        assert (backfill.json()["inserted"], backfill.json()["updated"]) == (1, 0)
+        assert sorted(item["temperature"] for item in history.json()) == [10.0, 11.0, 30.0]
+        break
+
+
+@pytest.mark.asyncio
+async def test_weather_latest_and_history(db_session):
+    async for session in db_session:
+        async def override_get_db():
+            yield session
+        app.dependency_overrides[get_db] = override_get_db
+        async with AsyncClient(app=app, base_url="http://test") as ac:
+            for hour, temperature in [(12, 2.0), (10, 0.0), (11, 1.0)]:
+                await ac.post("/weather/", json={
+                    "city": "History City",
+                    "temperature": temperature,
+                    "humidity": 50,
+                    "description": "Clear",
+                    "observed_at": f"2026-01-01T{hour}:00:00+00:00",
+                })
+            latest = await ac.get("/weather/History City")
+            first = await ac.get("/weather/History City/history", params={"limit": 2})
+            second = await ac.get("/weather/History City/history", params={
+                "limit": 2, "before": first.headers["X-Next-Before"],
+            })
+            window = await ac.get("/weather/History City/history", params={
+                "since": "2026-01-01T11:00:00+00:00", "until": "2026-01-01T12:00:00+00:00",
+            })
+        assert latest.json()["temperature"] == 2.0
+        assert [row["temperature"] for row in first.json()] == [2.0, 1.0]
+        assert [row["temperature"] for row in second.json()] == [0.0]
+        assert [row["temperature"] for row in window.json()] == [1.0]
+        break
+
+
+@pytest.mark.asyncio
+async def test_live_weather_misses_are_coalesced(monkeypatch):
+    import asyncio
+    from openweather_stub import run_stub_server
+    from user_management import weather as weather_module
+    from user_management.config import settings
+    from user_management.openweather import OpenWeatherClient
+
+    monkeypatch.delitem(app.dependency_overrides, get_db, raising=False)
+    monkeypatch.setattr(settings, "WEATHER_LIVE_FETCH_ENABLED", True)
+    await weather_module.weather_cache.invalidate("Stubville")
+    with run_stub_server(delay=0.2) as (base_url, stub):
+        client = OpenWeatherClient(base_url=base_url, api_key="test")
+        monkeypatch.setattr(weather_module, "openweather_client", client)
+        async with AsyncClient(app=app, base_url="http://test") as ac:
+            responses = await asyncio.gather(*(ac.get("/weather/Stubville") for _ in range(50)))
+            unknown = await ac.get("/weather/Nowhere")
+        await client.aclose()
+    assert all(r.status_code == 200 for r in responses)
+    assert {r.json()["temperature"] for r in responses} == {21.5}
+    assert stub.state.calls.count("Stubville") == 1
+    assert unknown.status_code == 404
+
+
+def test_python_percentiles_match_linear_interpolation():
+    from user_management.weather_stats import python_percentiles
+    assert python_percentiles([4.0, 1.0, 3.0, 2.0], [0, 50, 100, 25]) == [1.0, 2.5, 4.0, 1.75]
+
+
+@pytest.mark.asyncio
+async def test_weather_stats(db_session):
+    async for session in db_session:
+        async def override_get_db():
+            yield session
+        app.dependency_overrides[get_db] = override_get_db
+        async with AsyncClient(app=app, base_url="http://test") as ac:
+            for hour, temperature, humidity in [(1, 10.0, 40), (2, 20.0, 60), (3, 30.0, 80), (4, 40.0, 100)]:
+                await ac.post("/weather/", json={
+                    "city": "Stats City",
+                    "temperature": temperature,
+                    "humidity": humidity,
+                    "description": "Clear",
+                    "observed_at": f"2026-02-01T0{hour}:00:00+00:00",
+                })
+            by_city = await ac.get("/weather/stats", params={"city": "Stats City", "percentiles": [50, 100]})
+            window = await ac.get("/weather/stats", params={
+                "city": "Stats City",
+                "by_city": "false",
+                "since": "2026-02-01T02:00:00+00:00",
+                "until": "2026-02-01T04:00:00+00:00",
+            })
+            invalid = await ac.get("/weather/stats", params={"percentiles": [150]})
+        assert by_city.status_code == 200
+        [stats] = by_city.json()["stats"]
+        assert stats["city"] == "Stats City" and stats["count"] == 4
+        assert stats["temperature"]["min"] == 10.0 and stats["temperature"]["max"] == 40.0
+        assert stats["temperature"]["mean"] == 25.0
+        assert stats["temperature"]["percentiles"] == {"p50": 25.0, "p100": 40.0}
+        assert stats["humidity"]["percentiles"]["p50"] == 70.0
+        [overall] = window.json()["stats"]
+        assert overall["city"] is None and overall["count"] == 2
+        assert overall["temperature"]["percentiles"]["p50"] == 25.0
+        assert invalid.status_code == 400
+        break
+
+
+@pytest.mark.asyncio
+async def test_weather_stats_postgres_queries_without_city_grouping():
+    from sqlalchemy.dialects import postgresql
+    from user_management.weather_stats import _sql_aggregates, _sql_percentiles
+
+    class CapturingSession:
+        def __init__(self):
+            self.statements = []
+
+        async def execute(self, statement):
+            self.statements.append(str(statement.compile(dialect=postgresql.dialect())))
+
+            class Result:
+                def all(self):
+                    return []
+            return Result()
+
+    session = CapturingSession()
+    await _sql_aggregates(session, [], by_city=False)
+    await _sql_percentiles(session, [], by_city=False, percentiles=[50, 99])
+    aggregates, percentiles = session.statements
+    for statement in (aggregates, percentiles):
+        assert "NULL AS city" in statement
+        assert "GROUP BY" not in statement
+    assert "percentile_cont" in percentiles
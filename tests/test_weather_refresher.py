@@ -0,0 +1,43 @@
+import pytest
+
+from user_management.weather_refresher import CityPopularity, TokenBucket, WeatherRefresher
+
+
+def test_popularity_decays_and_ranks():
+    popularity = CityPopularity(half_life=10)
+    for _ in range(4):
+        popularity.record("Old", now=0)
+    popularity.record("New", now=30)
+    popularity.record("New", now=30)
+    # 4 запроса три полураспада назад весят 0.5, два свежих — 2
+    assert popularity.top(2, now=30) == ["New", "Old"]
+
+
+def test_token_bucket_limits_rate():
+    bucket = TokenBucket(rate_per_minute=2)
+    assert bucket.take(now=bucket.updated)
+    assert bucket.take(now=bucket.updated)
+    assert not bucket.take(now=bucket.updated)
+    assert bucket.take(now=bucket.updated + 30)
+
+
+@pytest.mark.asyncio
+async def test_refresher_refreshes_top_cities_ahead_of_expiry_within_budget():
+    popularity = CityPopularity(half_life=600)
+    for city, hits in (("Moscow", 5), ("London", 3), ("Paris", 1)):
+        for _ in range(hits):
+            popularity.record(city, now=0)
+    calls = []
+
+    async def refresh(city):
+        calls.append(city)
+
+    refresher = WeatherRefresher(popularity, refresh, top_n=2, interval=10, period=100, jitter=20,
+                                 budget_per_minute=60)
+    assert await refresher.run_once(now=1) == ["Moscow", "London"]
+    # До срока (period минус jitter) города не обновляются повторно
+    assert await refresher.run_once(now=50) == []
+    assert await refresher.run_once(now=102) == ["Moscow", "London"]
+
+    refresher.budget = TokenBucket(rate_per_minute=1)
+    assert await refresher.run_once(now=300) == ["Moscow"]
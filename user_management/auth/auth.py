@@ -1,25 +1,63 @@
 # auth/auth.py
+import hashlib
 import logging
-from datetime import datetime, timedelta
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Optional
 
-from fastapi_users import FastAPIUsers
+from fastapi_users import FastAPIUsers, exceptions
 from fastapi_users.authentication import CookieTransport, JWTStrategy, AuthenticationBackend
-from passlib.context import CryptContext
-from jose import jwt, JWTError
+import jwt
 from fastapi import Depends, HTTPException, status, Request
 
 from user_management.config import settings
+from user_management.cache import TTLCache
 from user_management.auth.database import User
-from user_management.auth.manager import get_user_manager
+from user_management.auth.keys import get_keyring
+from user_management.auth.manager import get_user_manager, load_user_by_id
+from user_management.auth.revocation import current_token_version, is_token_revoked
+from user_management.auth.security import verify_password
 
 logger = logging.getLogger(__name__)
 
 # Настройка транспорта куков
-cookie_transport = CookieTransport(cookie_name="bonds", cookie_max_age=3600)
+cookie_transport = CookieTransport(cookie_name="bonds", cookie_max_age=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+
+class KeyringJWTStrategy(JWTStrategy):
+    """
+    JWT-стратегия fastapi-users, подписывающая и проверяющая токены связкой ключей
+    (auth/keys.py): ключ проверки выбирается по kid из заголовка.
+    """
+
+    def __init__(self, lifetime_seconds: int):
+        super().__init__(secret=settings.SECRET_KEY, lifetime_seconds=lifetime_seconds)
+
+    async def read_token(self, token, user_manager):
+        if token is None:
+            return None
+        try:
+            data = get_keyring().decode(token, audience=self.token_audience)
+        except jwt.PyJWTError:
+            return None
+        user_id = data.get("sub")
+        if user_id is None:
+            return None
+        try:
+            return await user_manager.get(user_manager.parse_id(user_id))
+        except (exceptions.UserNotExists, exceptions.InvalidID):
+            return None
+
+    async def write_token(self, user) -> str:
+        claims = {"sub": str(user.id), "aud": self.token_audience}
+        if self.lifetime_seconds:
+            claims["exp"] = datetime.now(timezone.utc) + timedelta(seconds=self.lifetime_seconds)
+        return get_keyring().encode(claims)
 
 # Настройка JWT стратегии
 def get_jwt_strategy() -> JWTStrategy:
-    return JWTStrategy(secret=settings.SECRET_KEY, lifetime_seconds=3600)
+    return KeyringJWTStrategy(lifetime_seconds=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60)
 
 # Настройка аутентификационного бекенда
 auth_backend = AuthenticationBackend(
@@ -29,8 +67,6 @@ auth_backend = AuthenticationBackend(
 )
 
 # Обновление FastAPI Users для использования метода get_user_by_id
-logger.debug("Инициализация FastAPIUsers с auth_backend: %s", auth_backend)
-logger.debug("Используемый SECRET_KEY: %s", settings.SECRET_KEY)
 fastapi_users = FastAPIUsers[User, int](
     get_user_manager,
     [auth_backend]
@@ -38,24 +74,25 @@ fastapi_users = FastAPIUsers[User, int](
 
 # Маршруты FastAPI Users
 async def get_current_user(request: Request, user_manager=Depends(get_user_manager)):
-    # Логирование всех cookies
-    logger.debug(f"Cookies в запросе: {request.cookies}")
+    # Горячий путь: сами токены и cookies не логируются, сообщения форматируются только при DEBUG
     token = request.cookies.get("bonds")
-    logger.debug("Токен из куков: %s", token)
     if not token:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Токен не найден в куках"
         )
     decoded_token = decode_access_token(token)
-    logger.debug("Декодированный токен: %s", decoded_token)
     if not decoded_token:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Невалидный или просроченный токен"
         )
+    if is_token_revoked(decoded_token):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Токен отозван"
+        )
     user_id = decoded_token.get("sub")
-    logger.debug("ID пользователя из токена: %s", user_id)
     if not user_id:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -63,17 +100,19 @@ async def get_current_user(request: Request, user_manager=Depends(get_user_manag
         )
     # sub всегда строка, приводим к int
     user = await user_manager.get_user_by_id(int(user_id))
-    logger.debug("Извлеченный пользователь: %s", user)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Пользователь не найден"
         )
+    # Токены старого формата (без ver) не отзываются при деактивации, поэтому флаг проверяется здесь
+    if not user.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Пользователь неактивен"
+        )
     return user
 
-# Контекст шифрования для паролей
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 def authenticate_user(db, email: str, password: str):
     """
     Функция для аутентификации пользователя через синхронное соединение.
@@ -82,44 +121,67 @@ def authenticate_user(db, email: str, password: str):
     user = db.query(User).filter(User.email == email).first()
     if not user:
         return None
-    if not pwd_context.verify(password, user.hashed_password):
+    if not verify_password(password, user.hashed_password):
         return None
     return user
 
-def create_access_token(data: dict, expires_delta: timedelta = None):
+def principal_claims(user: User) -> dict:
+    """
+    Claims stateless-токена: всё, что нужно get_current_principal без запроса к БД.
+    user — ORM-объект или строка select с колонками id, is_active, is_superuser, role_id.
+    """
+    return {
+        "uid": user.id,
+        "act": user.is_active,
+        "su": user.is_superuser,
+        "rid": user.role_id,
+        "ver": current_token_version(user.id),
+        "jti": uuid.uuid4().hex,
+    }
+
+def create_access_token(data: dict, expires_delta: timedelta = None, principal: Optional[User] = None):
     """
     Создает JWT-токен, кодируя данные (data) и время истечения.
-    Если время не указано, используется время в 60 минут.
+    Если время не указано, используется ACCESS_TOKEN_EXPIRE_MINUTES.
+    Если передан principal, в токен добавляются claims для stateless-проверки.
     """
     to_encode = data.copy()
+    if principal is not None:
+        to_encode.update(principal_claims(principal))
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
-        expire = datetime.utcnow() + timedelta(minutes=60)  # Увеличено время действия токена до 60 минут
+        expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire, "aud": "fastapi-users:auth"})
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
-    return encoded_jwt
+    return get_keyring().encode(to_encode)
+
+# Кэш проверенных токенов: повторные запросы с тем же токеном не платят за проверку подписи и разбор claims
+token_cache = TTLCache(maxsize=settings.TOKEN_CACHE_MAXSIZE)
+
+def _token_cache_key(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
 
 def decode_access_token(token: str):
     """
     Декодирует переданный токен.
     Если токен просрочен или некорректен – возвращает None.
+    Успешно проверенные токены кэшируются до момента истечения (exp).
     """
-    logger.debug("Декодируем токен: %s", token)
+    if settings.TOKEN_CACHE_ENABLED:
+        cache_key = _token_cache_key(token)
+        cached = token_cache.get(cache_key)
+        if cached is not None:
+            return dict(cached)
     try:
-        decoded_token = jwt.decode(
-            token,
-            settings.SECRET_KEY,
-            algorithms=[settings.ALGORITHM],
-            audience="fastapi-users:auth"
-        )
-        logger.debug("Декодированный токен: %s", decoded_token)
-        if decoded_token["exp"] < datetime.utcnow().timestamp():
-            logger.debug("Токен просрочен: exp=%s, now=%s", decoded_token["exp"], datetime.utcnow().timestamp())
-            return None
+        # Подпись и exp проверяются ключом связки, выбранным по kid
+        decoded_token = get_keyring().decode(token, audience="fastapi-users:auth")
+        if settings.TOKEN_CACHE_ENABLED:
+            ttl = decoded_token["exp"] - time.time()
+            if ttl > 0:
+                token_cache.set(cache_key, dict(decoded_token), ttl=ttl)
         return decoded_token
-    except JWTError as e:
-        logger.error("Ошибка декодирования токена: %s", e)
+    except jwt.PyJWTError as e:
+        logger.debug("Ошибка декодирования токена: %s", e)
         return None
 
 async def get_login_response(user: User):
@@ -131,7 +193,6 @@ async def get_login_response(user: User):
         logger.debug("Generating token for user: %s", user.email)
         token = await auth_backend.strategy.write_token(user)
         if token:
-            logger.debug("Generated token: %s", token)
             return {"access_token": token, "token_type": "bearer"}
         else:
             logger.error("Token generation failed, token is None")
@@ -139,3 +200,64 @@ async def get_login_response(user: User):
     except Exception as e:
         logger.error("Error generating token: %s", e)
         raise
+
+
+@dataclass(frozen=True)
+class Principal:
+    """
+    Аутентифицированный субъект, восстановленный из claims токена.
+    """
+    id: int
+    is_active: bool
+    is_superuser: bool
+    role_id: Optional[int]
+
+async def get_current_principal(request: Request) -> Principal:
+    """
+    Быстрая зависимость для read-only эндпоинтов: доверяет claims stateless-токена
+    и не обращается к БД. Отзыв — через denylist и версии токенов (auth/revocation.py).
+    Для токенов старого формата пользователь загружается через кэш пользователей.
+    """
+    token = request.cookies.get("bonds")
+    if not token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Токен не найден в куках"
+        )
+    claims = decode_access_token(token)
+    if not claims or not claims.get("sub"):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Невалидный или просроченный токен"
+        )
+    if is_token_revoked(claims):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Токен отозван"
+        )
+    if "uid" in claims:
+        principal = Principal(
+            id=claims["uid"],
+            is_active=claims["act"],
+            is_superuser=claims["su"],
+            role_id=claims["rid"],
+        )
+    else:
+        user = await load_user_by_id(int(claims["sub"]))
+        if not user:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Пользователь не найден"
+            )
+        principal = Principal(
+            id=user.id,
+            is_active=user.is_active,
+            is_superuser=user.is_superuser,
+            role_id=user.role_id,
+        )
+    if not principal.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Пользователь неактивен"
+        )
+    return principal
@@ -1,39 +1,126 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.ext.asyncio import AsyncSession
+from user_management.config import settings
 from user_management.dependencies import get_db
-from user_management.auth.auth import create_access_token  # заменяем импорт
-from user_management.auth.security import verify_password
+from user_management.auth.auth import create_access_token, decode_access_token  # заменяем импорт
+from user_management.auth.keys import get_keyring
+from user_management.auth.rate_limit import login_limiter
+from user_management.auth.refresh import issue_refresh_token, rotate_refresh_token
+from user_management.auth.revocation import revoke_token
+from user_management.auth.permissions import require_permission
+from user_management.auth.bulk_import import import_users, iter_request_lines, parse_rows
+from user_management.auth.security import verify_password_or_dummy
 from user_management.models.user import User
+from sqlalchemy import update
 from sqlalchemy.future import select
-from user_management.auth.manager import create_user
-from user_management.auth.schemas import UserCreate
+from user_management.auth.manager import create_user, user_cache
+from user_management.auth.schemas import RefreshTokenRequest, UserCreate, UserImportResult, UserRead
 import logging
+import math
+from typing import Optional
 
 router = APIRouter()
+# Маршруты без префикса /auth (стандартные пути .well-known)
+well_known_router = APIRouter()
 logger = logging.getLogger(__name__)
 
 @router.post("/token", summary="Получить токен доступа")
 async def login_for_access_token(
+    request: Request,
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: AsyncSession = Depends(get_db),
 ):
-    logger.debug("Вход в login_for_access_token с form_data: %s", form_data)
-    query = select(User).filter(User.email == form_data.username)
-    result = await db.execute(query)
-    user = result.scalars().first()
+    logger.debug("Вход в login_for_access_token для %s", form_data.username)
+    client_ip = request.client.host if request.client else None
+    # Лимит проверяется до запроса к БД и хэширования пароля
+    if settings.LOGIN_RATE_LIMIT_ENABLED:
+        retry_after = await login_limiter.check(client_ip, form_data.username)
+        if retry_after:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Слишком много неудачных попыток входа, повторите позже",
+                headers={"Retry-After": str(math.ceil(retry_after))},
+            )
+    # Один запрос по уникальному индексу email и только нужные колонки, без загрузки ORM-сущности;
+    # флаги нужны для claims stateless-токена и берутся тем же запросом
+    query = select(
+        User.id, User.hashed_password, User.is_active, User.is_superuser, User.role_id,
+    ).where(User.email == form_data.username)
+    row = (await db.execute(query)).first()
+    user_id, hashed_password = (row.id, row.hashed_password) if row is not None else (None, None)
 
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    # Для неизвестного email выполняется фиктивная проверка той же стоимости
+    verified, updated_password_hash = await verify_password_or_dummy(form_data.password, hashed_password)
+    if not verified:
+        if settings.LOGIN_RATE_LIMIT_ENABLED:
+            await login_limiter.record_failure(client_ip, form_data.username)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Неверный email или пароль",
         )
+    if settings.LOGIN_RATE_LIMIT_ENABLED:
+        await login_limiter.record_success(form_data.username)
 
+    # Хэш со старой схемой или стоимостью прозрачно обновляется; коммит — вместе с refresh-токеном
+    if updated_password_hash is not None:
+        await db.execute(update(User).where(User.id == user_id).values(hashed_password=updated_password_hash))
+        user_cache.invalidate(user_id)
+    refresh_token = await issue_refresh_token(db, user_id)
+    await db.commit()
+    # Строка содержит id и флаги — всё, что нужно principal_claims
+    return token_response(user_id, refresh_token, row if settings.STATELESS_TOKENS_ENABLED else None)
+
+def token_response(user_id: int, refresh_token: str, principal: Optional[User] = None) -> dict:
     # sub должен быть строкой!
-    access_token = create_access_token(data={"sub": str(user.id)})
-    return {"access_token": access_token, "token_type": "bearer"}
+    access_token = create_access_token(data={"sub": str(user_id)}, principal=principal)
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "expires_in": settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+        "refresh_token": refresh_token,
+    }
+
+@router.post("/refresh", summary="Обновить access-токен по refresh-токену")
+async def refresh_access_token(body: RefreshTokenRequest, db: AsyncSession = Depends(get_db)):
+    # Вместо проверки пароля — поиск по индексу и HMAC; старый refresh-токен больше не действует
+    # Активность пользователя проверяется до ротации: неактивному новый токен не выдаётся
+    user, refresh_token = await rotate_refresh_token(db, body.refresh_token)
+    return token_response(user.id, refresh_token, user if settings.STATELESS_TOKENS_ENABLED else None)
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT, summary="Выйти и отозвать текущий access-токен")
+async def logout(request: Request):
+    token = request.cookies.get("bonds")
+    claims = decode_access_token(token) if token else None
+    # Stateless-токен действует до exp, поэтому его jti попадает в denylist
+    if claims and claims.get("jti"):
+        revoke_token(claims["jti"], claims["exp"])
+    response = Response(status_code=status.HTTP_204_NO_CONTENT)
+    response.delete_cookie("bonds")
+    return response
 
 @router.post("/register", summary="Регистрация нового пользователя")
 async def register_user(user: UserCreate):
     new_user = await create_user(user)
-    return {"message": "Пользователь успешно зарегистрирован", "user": new_user}
\ No newline at end of file
+    # Через UserRead, чтобы hashed_password не попал в ответ
+    return {"message": "Пользователь успешно зарегистрирован", "user": UserRead.model_validate(new_user)}
+
+@router.post("/register/bulk", response_model=UserImportResult, summary="Массовый импорт пользователей (CSV или NDJSON)")
+async def register_users_bulk(
+    request: Request,
+    current_user: User = Depends(require_permission("users:import")),
+    db: AsyncSession = Depends(get_db),
+):
+    fmt = "csv" if "csv" in request.headers.get("content-type", "") else "ndjson"
+    return await import_users(db, parse_rows(iter_request_lines(request), fmt))
+
+@well_known_router.get("/.well-known/jwks.json", summary="Открытые ключи для проверки JWT")
+async def jwks(request: Request):
+    keyring = get_keyring()
+    headers = {
+        "Cache-Control": f"public, max-age={settings.JWKS_CACHE_MAX_AGE}",
+        "ETag": keyring.jwks_etag,
+    }
+    if request.headers.get("if-none-match") == keyring.jwks_etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=keyring.jwks_body, media_type="application/json", headers=headers)
@@ -0,0 +1,211 @@
+# auth/bulk_import.py
+"""
+Массовый импорт пользователей из CSV или NDJSON.
+
+Строки читаются потоком и обрабатываются пачками: на пачку приходится один
+запрос проверки дубликатов email/username, параллельное хэширование паролей
+в пуле процессов и одна транзакция вставки. Ошибочные строки попадают в отчёт
+и не прерывают импорт.
+
+CLI:
+    python -m user_management.auth.bulk_import users.csv
+    python -m user_management.auth.bulk_import users.ndjson --chunk-size 500
+"""
+import argparse
+import asyncio
+import csv
+import json
+import logging
+import sys
+from typing import AsyncIterator, Iterable, Optional
+
+from pydantic import ValidationError
+from sqlalchemy import insert, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from user_management.auth.database import is_unique_violation
+from user_management.auth.schemas import UserCreate
+from user_management.auth.security import hash_passwords_bulk, shutdown_password_executor
+from user_management.config import settings
+from user_management.dependencies import async_session_maker
+from user_management.models.user import User
+
+logger = logging.getLogger(__name__)
+
+IMPORT_FIELDS = ("email", "username", "password", "full_name")
+
+
+async def iter_request_lines(request) -> AsyncIterator[str]:
+    """
+    Построчно читает тело HTTP-запроса, не загружая его целиком.
+    """
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8")
+    if buffer:
+        yield buffer.decode("utf-8")
+
+
+async def iter_file_lines(lines: Iterable[str]) -> AsyncIterator[str]:
+    for line in lines:
+        yield line
+
+
+async def parse_rows(lines: AsyncIterator[str], fmt: str) -> AsyncIterator[tuple]:
+    """
+    Отдаёт пары (номер строки данных, dict или текст ошибки разбора).
+    Для CSV первая строка — заголовок; многострочные значения не поддерживаются.
+    """
+    header = None
+    index = 0
+    async for line in lines:
+        line = line.rstrip("\r\n")
+        if not line.strip():
+            continue
+        if fmt == "csv":
+            values = next(csv.reader([line]))
+            if header is None:
+                header = [name.strip() for name in values]
+                continue
+            yield index, dict(zip(header, values))
+        else:
+            try:
+                row = json.loads(line)
+                yield index, row if isinstance(row, dict) else "Ожидается JSON-объект"
+            except ValueError:
+                yield index, "Некорректный JSON"
+        index += 1
+
+
+def validate_row(row: dict) -> UserCreate:
+    data = {field: row.get(field) or None for field in IMPORT_FIELDS}
+    return UserCreate.model_validate(data)
+
+
+async def insert_users(session: AsyncSession, rows: list) -> list:
+    """
+    Вставляет пачку одной транзакцией. Если пачку отвергло ограничение БД
+    (уникальный индекс при параллельной регистрации, NOT NULL, внешний ключ),
+    строки вставляются по одной и отвергнутые попадают в ошибки построчно.
+    Возвращает список (номер строки, ошибка) для невставленных строк.
+    """
+    try:
+        await session.execute(insert(User), [values for _, values in rows])
+        await session.commit()
+        return []
+    except IntegrityError:
+        await session.rollback()
+    errors = []
+    for index, values in rows:
+        try:
+            await session.execute(insert(User), [values])
+            await session.commit()
+        except IntegrityError as e:
+            await session.rollback()
+            if is_unique_violation(e):
+                errors.append((index, "Пользователь с таким email или username уже существует"))
+            else:
+                # Подробности (SQL, значения) — только в лог сервера
+                logger.warning("Строка %s импорта отвергнута БД: %s", index, e.orig)
+                errors.append((index, "Не удалось сохранить строку"))
+    return errors
+
+
+async def import_chunk(session: AsyncSession, chunk: list, report: dict) -> None:
+    """
+    Обрабатывает пачку валидных строк: дубликаты, хэширование, вставка.
+    """
+    emails = {user.email for _, user in chunk}
+    usernames = {user.username for _, user in chunk}
+    # Один запрос на пачку вместо запроса на каждого пользователя
+    query = select(User.email, User.username).where(or_(User.email.in_(emails), User.username.in_(usernames)))
+    existing = (await session.execute(query)).all()
+    taken_emails = {email for email, _ in existing}
+    taken_usernames = {username for _, username in existing}
+
+    accepted = []
+    for index, user in chunk:
+        if user.email in taken_emails or user.username in taken_usernames:
+            report["errors"].append({"index": index, "error": "Пользователь с таким email или username уже существует"})
+            continue
+        # Дубликаты внутри самого файла: побеждает первая строка
+        taken_emails.add(user.email)
+        taken_usernames.add(user.username)
+        accepted.append((index, user))
+    if not accepted:
+        return
+
+    hashes = await hash_passwords_bulk([user.password for _, user in accepted])
+    rows = [
+        (index, {
+            "email": user.email,
+            "username": user.username,
+            "full_name": user.full_name,
+            "hashed_password": hashed_password,
+            "is_active": True,
+            "is_superuser": False,
+            "is_verified": True,
+        })
+        for (index, user), hashed_password in zip(accepted, hashes)
+    ]
+    failed = await insert_users(session, rows)
+    report["created"] += len(rows) - len(failed)
+    report["errors"].extend({"index": index, "error": error} for index, error in failed)
+
+
+async def import_users(session: AsyncSession, rows: AsyncIterator[tuple], chunk_size: Optional[int] = None) -> dict:
+    """
+    Импортирует поток строк из parse_rows и возвращает отчёт в формате UserImportResult.
+    """
+    chunk_size = chunk_size or settings.BULK_IMPORT_CHUNK_SIZE
+    report = {"received": 0, "created": 0, "failed": 0, "errors": []}
+    chunk = []
+    async for index, row in rows:
+        report["received"] += 1
+        if isinstance(row, str):
+            report["errors"].append({"index": index, "error": row})
+            continue
+        try:
+            chunk.append((index, validate_row(row)))
+        except ValidationError as e:
+            report["errors"].append({"index": index, "error": "; ".join(
+                f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in e.errors()
+            )})
+            continue
+        if len(chunk) >= chunk_size:
+            await import_chunk(session, chunk, report)
+            chunk = []
+    if chunk:
+        await import_chunk(session, chunk, report)
+    report["errors"].sort(key=lambda error: error["index"])
+    report["failed"] = len(report["errors"])
+    logger.info("Импорт пользователей: получено %s, создано %s, ошибок %s",
+                report["received"], report["created"], report["failed"])
+    return report
+
+
+async def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Массовый импорт пользователей из CSV или NDJSON")
+    parser.add_argument("path", help="Файл с пользователями (.csv или .ndjson/.jsonl)")
+    parser.add_argument("--format", choices=("csv", "ndjson"), help="Формат файла (по умолчанию по расширению)")
+    parser.add_argument("--chunk-size", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    fmt = args.format or ("csv" if args.path.lower().endswith(".csv") else "ndjson")
+    try:
+        with open(args.path, encoding="utf-8", newline="") as f:
+            async with async_session_maker() as session:
+                report = await import_users(session, parse_rows(iter_file_lines(f), fmt), args.chunk_size)
+    finally:
+        shutdown_password_executor()
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    return 0 if not report["failed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -1,46 +1,46 @@
 # auth/database.py
-import sys
 import logging
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import Depends
 from fastapi_users_db_sqlalchemy import SQLAlchemyUserDatabase
 
-from user_management.config import settings
+from user_management.dependencies import async_session_maker, get_db, get_engine
 from user_management.models.user import User
 
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.DEBUG)
-if not logger.handlers:
-    handler = logging.StreamHandler(sys.stdout)
-    handler.setLevel(logging.DEBUG)
-    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-    handler.setFormatter(formatter)
-    logger.addHandler(handler)
 
-# Основное асинхронное подключение (например, для PostgreSQL)
-engine = create_async_engine(settings.DATABASE_URL, echo=True)
-logger.info(f"Initialized main async engine with DATABASE_URL: {settings.DATABASE_URL}")
-
-async_session_maker = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
-
-# Зависимость, которая создаёт и возвращает сессию
-async def get_db():
-    async with async_session_maker() as session:
-        yield session
+# engine (get_engine), async_session_maker и get_db общие для всего приложения (см. dependencies.py),
+# чтобы у всех потребителей был один пул соединений.
 
 # Ключевая зависимость: обёртка пользователя для работы fastapi_users.
 # SQLAlchemyUserDatabase реализует методы вроде get(), которые правильно вызывают session.get(User, id).
 async def get_user_db(session: AsyncSession = Depends(get_db)) -> SQLAlchemyUserDatabase:
     return SQLAlchemyUserDatabase(User, session)
 
-# Альтернативное подключение (например, для SQLite)
-sqlite_engine = create_async_engine(settings.DATABASE_URL, echo=True)
-logger.info(f"Initialized alternative async engine with DATABASE_URL: {settings.DATABASE_URL}")
-
-sqlite_async_session_maker = sessionmaker(sqlite_engine, class_=AsyncSession, expire_on_commit=False)
-
-async def get_sqlite_db():
-    async with sqlite_async_session_maker() as session:
-        yield session
-
+# SQLSTATE нарушения уникальности (PostgreSQL и совместимые драйверы)
+UNIQUE_VIOLATION_SQLSTATE = "23505"
+
+def is_unique_violation(error: IntegrityError) -> bool:
+    """
+    True, если IntegrityError вызвана уникальным индексом, а не NOT NULL или внешним ключом.
+    """
+    orig = error.orig
+    code = getattr(orig, "sqlstate", None) or getattr(orig, "pgcode", None)
+    if code is not None:
+        return code == UNIQUE_VIOLATION_SQLSTATE
+    errorname = getattr(orig, "sqlite_errorname", None)
+    if errorname is not None:
+        return errorname in ("SQLITE_CONSTRAINT_UNIQUE", "SQLITE_CONSTRAINT_PRIMARYKEY")
+    return "UNIQUE constraint failed" in str(orig)
+
+# Альтернативное подключение оставлено для совместимости: оно указывает на тот же engine
+sqlite_async_session_maker = async_session_maker
+get_sqlite_db = get_db
+
+
+def __getattr__(name):
+    # engine создаётся лениво, поэтому отдаётся по обращению, а не при импорте
+    if name in ("engine", "sqlite_engine"):
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
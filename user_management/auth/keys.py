@@ -0,0 +1,235 @@
+# auth/keys.py
+"""
+Связка ключей для подписи и проверки JWT.
+
+Без JWT_KEYRING_PATH токены подписываются HS256 и SECRET_KEY, как раньше.
+С файлом связки токены подписываются асимметричными ключами (ES256, EdDSA, RS256),
+в заголовок пишется kid, а открытые ключи публикуются в /.well-known/jwks.json,
+чтобы другие сервисы проверяли токены сами, без общего секрета.
+
+Формат файла связки (пути к PEM — относительно файла):
+    {"keys": [
+        {"kid": "2026-10", "alg": "ES256", "private_key": "2026-10.pem",
+         "not_before": "2026-10-01T00:00:00+00:00"},
+        {"kid": "2026-11", "alg": "EdDSA", "private_key": "2026-11.pem",
+         "not_before": "2026-11-01T00:00:00+00:00"},
+        {"kid": "2026-09", "alg": "ES256", "public_key": "2026-09.pub.pem",
+         "not_after": "2026-10-02T00:00:00+00:00"}
+    ]}
+
+Подписывает ключ с закрытой частью и самым поздним уже наступившим not_before,
+поэтому ротация по расписанию не требует перезапуска. Проверяются все ключи связки,
+пока не наступил их not_after.
+
+CLI (новый ключ добавляется в файл связки):
+    python -m user_management.auth.keys keys/keyring.json --kid 2026-11 --alg EdDSA --not-before 2026-11-01T00:00:00+00:00
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sys
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, rsa
+
+from user_management.config import settings
+
+logger = logging.getLogger(__name__)
+
+ASYMMETRIC_ALGORITHMS = ("ES256", "ES384", "EdDSA", "RS256")
+
+
+@dataclass(frozen=True)
+class SigningKey:
+    """
+    Разобранный ключ связки: объекты ключей создаются один раз при загрузке.
+    """
+    kid: Optional[str]
+    algorithm: str
+    private_key: object
+    public_key: object
+    not_before: Optional[datetime] = None
+    not_after: Optional[datetime] = None
+
+    def can_sign(self, now: datetime) -> bool:
+        return self.private_key is not None and self.can_verify(now) and (
+            self.not_before is None or self.not_before <= now
+        )
+
+    def can_verify(self, now: datetime) -> bool:
+        return self.not_after is None or now < self.not_after
+
+
+def _parse_time(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _read_pem(base_dir: str, path: str) -> bytes:
+    with open(os.path.join(base_dir, path), "rb") as f:
+        return f.read()
+
+
+class Keyring:
+    """
+    Набор ключей по kid. Выбор ключа для проверки — поиск в словаре,
+    PEM не разбирается повторно.
+    """
+
+    def __init__(self, keys: List[SigningKey]):
+        if not keys:
+            raise ValueError("Связка ключей пуста")
+        self._keys: Dict[Optional[str], SigningKey] = {key.kid: key for key in keys}
+        self.symmetric = all(key.algorithm.startswith("HS") for key in keys)
+        jwks = {"keys": [self._to_jwk(key) for key in keys if not key.algorithm.startswith("HS")]}
+        # JWKS не меняется до перезагрузки связки: тело и ETag считаются один раз
+        self.jwks_body = json.dumps(jwks, separators=(",", ":")).encode()
+        self.jwks_etag = '"' + hashlib.sha256(self.jwks_body).hexdigest()[:32] + '"'
+
+    @classmethod
+    def from_secret(cls, secret: str, algorithm: str) -> "Keyring":
+        return cls([SigningKey(kid=None, algorithm=algorithm, private_key=secret, public_key=secret)])
+
+    @classmethod
+    def from_file(cls, path: str) -> "Keyring":
+        with open(path, encoding="utf-8") as f:
+            config = json.load(f)
+        base_dir = os.path.dirname(os.path.abspath(path))
+        keys = []
+        for entry in config["keys"]:
+            algorithm = entry["alg"]
+            if algorithm not in ASYMMETRIC_ALGORITHMS:
+                raise ValueError(f"Неподдерживаемый алгоритм ключа {entry['kid']}: {algorithm}")
+            private_key = None
+            if entry.get("private_key"):
+                private_key = serialization.load_pem_private_key(_read_pem(base_dir, entry["private_key"]), password=None)
+                public_key = private_key.public_key()
+            else:
+                public_key = serialization.load_pem_public_key(_read_pem(base_dir, entry["public_key"]))
+            keys.append(SigningKey(
+                kid=entry["kid"],
+                algorithm=algorithm,
+                private_key=private_key,
+                public_key=public_key,
+                not_before=_parse_time(entry.get("not_before")),
+                not_after=_parse_time(entry.get("not_after")),
+            ))
+        return cls(keys)
+
+    @staticmethod
+    def _to_jwk(key: SigningKey) -> dict:
+        jwk = jwt.get_algorithm_by_name(key.algorithm).to_jwk(key.public_key, as_dict=True)
+        jwk.update({"kid": key.kid, "alg": key.algorithm, "use": "sig"})
+        return jwk
+
+    def signing_key(self, now: Optional[datetime] = None) -> SigningKey:
+        """
+        Активный ключ подписи: самый поздний not_before среди уже действующих ключей.
+        """
+        now = now or datetime.now(timezone.utc)
+        candidates = [key for key in self._keys.values() if key.can_sign(now)]
+        if not candidates:
+            raise RuntimeError("Нет действующего ключа для подписи токенов")
+        return max(candidates, key=lambda key: key.not_before or datetime.min.replace(tzinfo=timezone.utc))
+
+    def verification_key(self, kid: Optional[str], now: Optional[datetime] = None) -> Optional[SigningKey]:
+        key = self._keys.get(kid)
+        if key is None or not key.can_verify(now or datetime.now(timezone.utc)):
+            return None
+        return key
+
+    def encode(self, claims: dict) -> str:
+        key = self.signing_key()
+        headers = {"kid": key.kid} if key.kid else None
+        return jwt.encode(claims, key.private_key, algorithm=key.algorithm, headers=headers)
+
+    def decode(self, token: str, audience) -> dict:
+        """
+        Проверяет подпись ключом из заголовка kid и возвращает claims.
+        Алгоритм берётся из ключа, а не из токена. Ошибки — jwt.PyJWTError.
+        """
+        kid = jwt.get_unverified_header(token).get("kid")
+        key = self.verification_key(kid)
+        if key is None:
+            raise jwt.InvalidKeyError(f"Неизвестный или выведенный из оборота kid: {kid}")
+        return jwt.decode(token, key.public_key, algorithms=[key.algorithm], audience=audience)
+
+
+_keyring: Optional[Keyring] = None
+
+
+def load_keyring() -> Keyring:
+    """
+    (Пере)загружает связку по Settings. Вызывается при первом обращении
+    и может быть вызвана повторно после добавления ключа в файл.
+    """
+    global _keyring
+    if settings.JWT_KEYRING_PATH:
+        _keyring = Keyring.from_file(settings.JWT_KEYRING_PATH)
+        logger.info("Загружена связка JWT-ключей: %s", settings.JWT_KEYRING_PATH)
+    else:
+        _keyring = Keyring.from_secret(settings.SECRET_KEY, settings.ALGORITHM)
+    return _keyring
+
+
+def get_keyring() -> Keyring:
+    return _keyring or load_keyring()
+
+
+def generate_private_key(algorithm: str):
+    if algorithm == "ES256":
+        return ec.generate_private_key(ec.SECP256R1())
+    if algorithm == "ES384":
+        return ec.generate_private_key(ec.SECP384R1())
+    if algorithm == "EdDSA":
+        return ed25519.Ed25519PrivateKey.generate()
+    if algorithm == "RS256":
+        return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    raise ValueError(f"Неподдерживаемый алгоритм: {algorithm}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Добавить новый ключ подписи в связку JWT-ключей")
+    parser.add_argument("keyring", help="Путь к JSON-файлу связки (создаётся, если его нет)")
+    parser.add_argument("--kid", required=True)
+    parser.add_argument("--alg", choices=ASYMMETRIC_ALGORITHMS, default="ES256")
+    parser.add_argument("--not-before", help="Начало подписи этим ключом (ISO 8601), по умолчанию сразу")
+    args = parser.parse_args(argv)
+
+    config = {"keys": []}
+    if os.path.exists(args.keyring):
+        with open(args.keyring, encoding="utf-8") as f:
+            config = json.load(f)
+    if any(entry["kid"] == args.kid for entry in config["keys"]):
+        parser.error(f"Ключ с kid {args.kid} уже есть в связке")
+
+    pem_name = f"{args.kid}.pem"
+    pem = generate_private_key(args.alg).private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption(),
+    )
+    base_dir = os.path.dirname(os.path.abspath(args.keyring))
+    os.makedirs(base_dir, exist_ok=True)
+    fd = os.open(os.path.join(base_dir, pem_name), os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(pem)
+
+    entry = {"kid": args.kid, "alg": args.alg, "private_key": pem_name}
+    if args.not_before:
+        entry["not_before"] = _parse_time(args.not_before).isoformat()
+    config["keys"].append(entry)
+    with open(args.keyring, "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2)
+    print(f"Ключ {args.kid} ({args.alg}) добавлен в {args.keyring}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,17 +3,25 @@ from typing import Optional
 from fastapi import Depends, Request, HTTPException
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi_users import BaseUserManager, IntegerIDMixin
-from user_management.auth.database import get_user_db, async_session_maker
+from user_management.auth.database import get_user_db, async_session_maker, is_unique_violation
 from user_management.models.user import User
 from user_management.config import settings
-from passlib.context import CryptContext
+from user_management.cache import TTLCache
+from user_management.auth.security import get_password_hash_async, password_service, verify_password_or_dummy
+from user_management.auth.revocation import revoke_user_tokens
+from user_management.auth.rate_limit import login_limiter
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.future import select
 import logging
 
 logger = logging.getLogger("auth_manager")
 
-# Контекст для проверки паролей с использованием bcrypt
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Кэш пользователей по ID, чтобы не ходить в БД на каждый аутентифицированный запрос.
+# Инвалидируется при обновлении, удалении и создании пользователя.
+user_cache = TTLCache(maxsize=settings.USER_CACHE_MAXSIZE, ttl=settings.USER_CACHE_TTL)
+
+# Поля, изменение которых отзывает выпущенные токены пользователя
+TOKEN_REVOKING_FIELDS = frozenset({"is_active", "is_superuser", "role_id", "password", "hashed_password"})
 
 class UserManager(IntegerIDMixin, BaseUserManager[User, int]):
     # Используем SECRET_KEY для генерации токенов сброса пароля и верификации
@@ -21,28 +29,61 @@ class UserManager(IntegerIDMixin, BaseUserManager[User, int]):
     verification_token_secret = settings.SECRET_KEY
 
     def __init__(self, user_db):
-        super().__init__(user_db)
+        # Общий сервис хэширования вместо PasswordHelper fastapi-users: одни настройки для всех путей
+        super().__init__(user_db, password_helper=password_service)
 
     async def authenticate(self, credentials: OAuth2PasswordRequestForm) -> Optional[User]:
         """
         Аутентифицирует пользователя по email/username и проверяет пароль.
+        Устаревший хэш пароля перезаписывается с текущими параметрами.
+        IP здесь недоступен, поэтому применяется только лимит по учётной записи.
         """
+        if settings.LOGIN_RATE_LIMIT_ENABLED and await login_limiter.check(None, credentials.username):
+            logger.warning("Login rate limit exceeded for user %s", credentials.username)
+            return None
         user = await self.get_user(credentials.username)
-        if user and self.verify_password(credentials.password, user.hashed_password):
-            logger.info("User %s authenticated successfully", user.email)
-            return user
-        logger.warning("Authentication failed for user %s", credentials.username)
-        return None
+        # Неизвестный email проверяется против фиктивного хэша, чтобы время ответа было одинаковым
+        verified, updated_password_hash = await verify_password_or_dummy(
+            credentials.password, user.hashed_password if user is not None else None
+        )
+        if not verified:
+            if settings.LOGIN_RATE_LIMIT_ENABLED:
+                await login_limiter.record_failure(None, credentials.username)
+            logger.warning("Authentication failed for user %s", credentials.username)
+            return None
+        if settings.LOGIN_RATE_LIMIT_ENABLED:
+            await login_limiter.record_success(credentials.username)
+        if updated_password_hash is not None:
+            user = await self.user_db.update(user, {"hashed_password": updated_password_hash})
+            user_cache.invalidate(user.id)
+        logger.info("User %s authenticated successfully", user.email)
+        return user
 
     def verify_password(self, plain_password: str, hashed_password: str) -> bool:
         """
         Сравнивает введённый пароль с его хешем.
         """
-        return pwd_context.verify(plain_password, hashed_password)
+        return password_service.verify(plain_password, hashed_password)
 
     async def on_after_register(self, user: User, request: Optional[Request] = None):
+        user_cache.invalidate(user.id)
         logger.info("User %s has registered.", user.email)
 
+    async def on_after_update(self, user: User, update_dict: dict, request: Optional[Request] = None):
+        # PATCH /users/{id} и /users/me (в т.ч. деактивация через is_active).
+        # Stateless-токены несут флаги пользователя, поэтому выпущенные ранее отзываются,
+        # но только при смене этих флагов или пароля: правка full_name токены не трогает.
+        user_cache.invalidate(user.id)
+        if TOKEN_REVOKING_FIELDS.intersection(update_dict):
+            revoke_user_tokens(user.id)
+
+    async def on_before_delete(self, user: User, request: Optional[Request] = None):
+        user_cache.invalidate(user.id)
+
+    async def on_after_delete(self, user: User, request: Optional[Request] = None):
+        user_cache.invalidate(user.id)
+        revoke_user_tokens(user.id)
+
     async def get_user(self, email: str) -> Optional[User]:
         """
         Получает пользователя по email напрямую через сессию.
@@ -58,14 +99,7 @@ class UserManager(IntegerIDMixin, BaseUserManager[User, int]):
         """
         Получает пользователя по ID напрямую через сессию.
         """
-        logger.debug("Вызов метода get_user_by_id с user_id: %s", user_id)
-        logger.debug("Метод get_user_by_id вызван с user_id: %s", user_id)
-        logger.debug("Поиск пользователя с ID: %s", user_id)
-        async with async_session_maker() as session:
-            query = select(User).filter(User.id == user_id)
-            result = await session.execute(query)
-            user = result.scalars().first()
-        return user
+        return await load_user_by_id(user_id)
 
 # Зависимость для получения экземпляра UserManager.
 # Здесь вместо get_db передаём обёртку get_user_db, которая возвращает SQLAlchemyUserDatabase,
@@ -74,6 +108,24 @@ async def get_user_manager(user_db=Depends(get_user_db)):
     logger.debug("Инициализация UserManager")
     yield UserManager(user_db)
 
+async def load_user_by_id(user_id: int) -> Optional[User]:
+    """
+    Получает пользователя по ID через кэш пользователей, при промахе — из БД.
+    Не требует экземпляра UserManager (используется и вне зависимостей FastAPI).
+    """
+    logger.debug("Поиск пользователя с ID: %s", user_id)
+    if settings.USER_CACHE_ENABLED:
+        user = user_cache.get(user_id)
+        if user is not None:
+            return user
+    async with async_session_maker() as session:
+        query = select(User).filter(User.id == user_id)
+        result = await session.execute(query)
+        user = result.scalars().first()
+    if user is not None and settings.USER_CACHE_ENABLED:
+        user_cache.set(user_id, user)
+    return user
+
 # Дополнительная зависимость для получения пользователя по email (для регистрации и проверки)
 async def get_user_by_email(email: str) -> Optional[User]:
     async with async_session_maker() as session:
@@ -85,21 +137,9 @@ async def get_user_by_email(email: str) -> Optional[User]:
 async def create_user(user_data) -> User:
     logger.info("Начало создания пользователя: %s", user_data.email)
     try:
-        logger.debug("Данные пользователя для создания: %s", user_data.dict())
-
-        # Проверка на существование пользователя с таким же email
-        async with async_session_maker() as session:
-            query = select(User).filter(User.email == user_data.email)
-            result = await session.execute(query)
-            existing_user = result.scalars().first()
-            if existing_user:
-                logger.error("Пользователь с email %s уже существует", user_data.email)
-                raise HTTPException(
-                    status_code=400,
-                    detail="Пользователь с таким email уже существует"
-                )
+        logger.debug("Данные пользователя для создания: %s", user_data.dict(exclude={"password"}))
 
-        hashed_password = pwd_context.hash(user_data.password)
+        hashed_password = await get_password_hash_async(user_data.password)
         logger.info("Пароль успешно хэширован")
         new_user = User(
             email=user_data.email,
@@ -110,12 +150,28 @@ async def create_user(user_data) -> User:
             is_superuser=False,
             is_verified=True
         )
+        # Одна транзакция: дубликаты отсекают уникальные индексы на email и username,
+        # поэтому отдельная проверка SELECT не нужна и гонка при одновременной регистрации невозможна.
         async with async_session_maker() as session:
             session.add(new_user)
-            await session.commit()
-            await session.refresh(new_user)
+            try:
+                await session.commit()
+            except IntegrityError as e:
+                await session.rollback()
+                # NOT NULL, внешние ключи и прочее — ошибка сервера, а не занятый email
+                if not is_unique_violation(e):
+                    raise
+                logger.info("Пользователь с email %s или username %s уже существует", user_data.email, user_data.username)
+                raise HTTPException(
+                    status_code=400,
+                    detail="Пользователь с таким email или username уже существует"
+                )
+            # refresh не нужен: id получен при вставке, а expire_on_commit=False сохраняет атрибуты
+            user_cache.invalidate(new_user.id)
             logger.info("Пользователь успешно создан: %s", new_user.email)
         return new_user
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error("Ошибка при создании пользователя: %s", str(e))
         raise HTTPException(status_code=500, detail="Ошибка при создании пользователя")
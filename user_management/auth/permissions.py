@@ -0,0 +1,125 @@
+# auth/permissions.py
+import logging
+from typing import Dict, FrozenSet, Iterable, Optional
+
+from fastapi import Depends, HTTPException, status
+from sqlalchemy import event
+from sqlalchemy.future import select
+from sqlalchemy.orm import Session
+
+from user_management.auth.auth import get_current_user
+from user_management.dependencies import async_session_maker
+from user_management.models.role import Role
+from user_management.models.user import User
+
+logger = logging.getLogger(__name__)
+
+
+def parse_permissions(raw) -> FrozenSet[str]:
+    """
+    Приводит JSON-поле Role.permissions к множеству строк.
+    Поддерживаются список ["users:read", ...] и словарь {"users:read": true, ...}.
+    """
+    if not raw:
+        return frozenset()
+    if isinstance(raw, dict):
+        return frozenset(name for name, allowed in raw.items() if allowed)
+    if isinstance(raw, str):
+        return frozenset([raw])
+    return frozenset(str(name) for name in raw)
+
+
+class RoleIndex:
+    """
+    In-memory индекс ролей: role_id -> множество разрешений.
+    Проверка разрешения — поиск в множестве, без обращения к БД.
+    """
+
+    def __init__(self):
+        self._permissions: Dict[int, FrozenSet[str]] = {}
+
+    def load(self, roles: Iterable[tuple]) -> None:
+        """
+        Полностью заменяет индекс строками (id, permissions).
+        """
+        self._permissions = {role_id: parse_permissions(raw) for role_id, raw in roles}
+
+    def set(self, role_id: int, raw) -> None:
+        self._permissions[role_id] = parse_permissions(raw)
+
+    def remove(self, role_id: int) -> None:
+        self._permissions.pop(role_id, None)
+
+    def permissions(self, role_id: Optional[int]) -> FrozenSet[str]:
+        if role_id is None:
+            return frozenset()
+        return self._permissions.get(role_id, frozenset())
+
+    def has_permissions(self, role_id: Optional[int], required: FrozenSet[str]) -> bool:
+        return required <= self.permissions(role_id)
+
+    def __len__(self) -> int:
+        return len(self._permissions)
+
+
+role_index = RoleIndex()
+
+
+async def refresh_roles() -> None:
+    """
+    Перечитывает все роли из БД (вызывается при старте приложения).
+    """
+    async with async_session_maker() as session:
+        result = await session.execute(select(Role.id, Role.permissions))
+        role_index.load(result.all())
+    logger.info("Загружено ролей в индекс разрешений: %s", len(role_index))
+
+
+# Изменения ролей через ORM применяются к индексу после успешного коммита
+@event.listens_for(Session, "after_flush")
+def _collect_role_changes(session, flush_context):
+    changes = session.info.setdefault("role_changes", {})
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, Role):
+            changes[obj.id] = obj.permissions
+    for obj in session.deleted:
+        if isinstance(obj, Role):
+            changes[obj.id] = None
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_role_changes(session):
+    for role_id, raw in session.info.pop("role_changes", {}).items():
+        if raw is None:
+            role_index.remove(role_id)
+        else:
+            role_index.set(role_id, raw)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_role_changes(session):
+    session.info.pop("role_changes", None)
+
+
+def require_permission(*permissions: str):
+    """
+    Фабрика зависимостей FastAPI: пропускает активного пользователя, у роли которого есть
+    все перечисленные разрешения. Суперпользователю разрешено всё.
+    """
+    required = frozenset(permissions)
+
+    async def dependency(current_user: User = Depends(get_current_user)) -> User:
+        # Деактивированная учётка с ещё действующим токеном не получает доступа, даже суперпользователь
+        if not current_user.is_active:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Пользователь неактивен",
+            )
+        if current_user.is_superuser or role_index.has_permissions(current_user.role_id, required):
+            return current_user
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Недостаточно прав",
+        )
+
+    return dependency
@@ -0,0 +1,181 @@
+# auth/rate_limit.py
+"""
+Ограничение частоты неудачных входов по IP и по учётной записи.
+
+Считаются только неудачные попытки в скользящем окне. При превышении лимита ключ
+блокируется с экспоненциально растущей паузой (base * 2^n, не больше max).
+Проверка выполняется до поиска пользователя и проверки пароля, поэтому
+перебор паролей не расходует CPU на bcrypt/argon2.
+"""
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from user_management.config import settings
+from user_management.metrics import login_rate_limit_decisions, login_rate_limit_failures
+
+
+class RateLimitBackend:
+    """
+    Интерфейс хранилища счётчиков. Методы асинхронные, чтобы его могла
+    реализовать и сетевая реализация (например, Redis-совместимая, через Lua-скрипт).
+    """
+
+    async def retry_after(self, key: str) -> float:
+        """
+        Сколько секунд ключ ещё заблокирован (0 — попытка разрешена).
+        """
+        raise NotImplementedError
+
+    async def add_failure(self, key: str, limit: int) -> float:
+        """
+        Учитывает неудачную попытку; возвращает длительность блокировки, если она началась.
+        """
+        raise NotImplementedError
+
+    async def reset(self, key: str) -> None:
+        raise NotImplementedError
+
+
+class _Counter:
+    """
+    Скользящее окно из двух фиксированных: счётчик предыдущего окна учитывается
+    с весом, убывающим по мере сдвига текущего.
+    """
+    __slots__ = ("window_start", "previous", "current", "blocked_until", "strikes", "last_seen")
+
+    def __init__(self, now: float):
+        self.window_start = now
+        self.previous = 0
+        self.current = 0
+        self.blocked_until = 0.0
+        self.strikes = 0
+        self.last_seen = now
+
+    def roll(self, now: float, window: float) -> None:
+        elapsed = int((now - self.window_start) // window)
+        if elapsed >= 1:
+            self.previous = self.current if elapsed == 1 else 0
+            self.current = 0
+            self.window_start += elapsed * window
+
+    def estimate(self, now: float, window: float) -> float:
+        weight = 1.0 - (now - self.window_start) / window
+        return self.previous * weight + self.current
+
+
+class InMemoryRateLimitBackend(RateLimitBackend):
+    """
+    Счётчики в памяти процесса. Давно не использованные ключи вытесняются
+    по времени, общее число ключей ограничено maxsize.
+    """
+
+    def __init__(self, window: float, backoff_base: float, backoff_max: float, maxsize: int = 100000):
+        self.window = window
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.maxsize = maxsize
+        self._counters: "OrderedDict[str, _Counter]" = OrderedDict()
+
+    def _evict(self, now: float) -> None:
+        # Порядок OrderedDict — по последнему обращению, поэтому достаточно смотреть в начало
+        while self._counters:
+            key, counter = next(iter(self._counters.items()))
+            idle = now - counter.last_seen > 2 * self.window and counter.blocked_until <= now
+            if not idle and len(self._counters) <= self.maxsize:
+                break
+            del self._counters[key]
+
+    async def retry_after(self, key: str) -> float:
+        counter = self._counters.get(key)
+        if counter is None:
+            return 0.0
+        return max(0.0, counter.blocked_until - time.monotonic())
+
+    async def add_failure(self, key: str, limit: int) -> float:
+        now = time.monotonic()
+        counter = self._counters.get(key)
+        if counter is None:
+            counter = self._counters[key] = _Counter(now)
+        else:
+            self._counters.move_to_end(key)
+        counter.last_seen = now
+        counter.roll(now, self.window)
+        counter.current += 1
+        blocked_for = 0.0
+        if counter.estimate(now, self.window) >= limit:
+            blocked_for = min(self.backoff_max, self.backoff_base * 2 ** counter.strikes)
+            counter.strikes += 1
+            counter.blocked_until = now + blocked_for
+        self._evict(now)
+        return blocked_for
+
+    async def reset(self, key: str) -> None:
+        self._counters.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._counters)
+
+
+def create_rate_limit_backend(backend: str) -> RateLimitBackend:
+    """
+    Создаёт хранилище счётчиков по имени из настроек.
+    """
+    if backend == "memory":
+        return InMemoryRateLimitBackend(
+            window=settings.LOGIN_RATE_LIMIT_WINDOW,
+            backoff_base=settings.LOGIN_RATE_LIMIT_BACKOFF_BASE,
+            backoff_max=settings.LOGIN_RATE_LIMIT_BACKOFF_MAX,
+            maxsize=settings.LOGIN_RATE_LIMIT_MAXSIZE,
+        )
+    raise ValueError(f"Неизвестный бэкенд ограничения частоты: {backend}")
+
+
+class LoginRateLimiter:
+    """
+    Лимиты неудачных входов по IP и по учётной записи поверх RateLimitBackend.
+    Решения публикуются в метриках login_rate_limit_*.
+    """
+
+    def __init__(self, backend: RateLimitBackend, ip_limit: int, account_limit: int):
+        self.backend = backend
+        self.limits = {"ip": ip_limit, "account": account_limit}
+
+    @staticmethod
+    def _keys(ip: Optional[str], account: Optional[str]) -> list:
+        keys = []
+        if ip:
+            keys.append(("ip", f"ip:{ip}"))
+        if account:
+            keys.append(("account", f"account:{account.strip().lower()}"))
+        return keys
+
+    async def check(self, ip: Optional[str], account: Optional[str]) -> float:
+        """
+        Возвращает, сколько секунд ждать до следующей попытки (0 — можно пробовать).
+        """
+        retry_after = 0.0
+        for scope, key in self._keys(ip, account):
+            scope_retry = await self.backend.retry_after(key)
+            login_rate_limit_decisions.inc(scope, "rejected" if scope_retry else "allowed")
+            retry_after = max(retry_after, scope_retry)
+        return retry_after
+
+    async def record_failure(self, ip: Optional[str], account: Optional[str]) -> None:
+        for scope, key in self._keys(ip, account):
+            if await self.backend.add_failure(key, self.limits[scope]):
+                login_rate_limit_failures.inc(scope, "blocked")
+            else:
+                login_rate_limit_failures.inc(scope, "counted")
+
+    async def record_success(self, account: Optional[str]) -> None:
+        # Счётчик IP не сбрасывается: успешный вход одной учётки не должен обнулять перебор других
+        for _, key in self._keys(None, account):
+            await self.backend.reset(key)
+
+
+login_limiter = LoginRateLimiter(
+    create_rate_limit_backend(settings.LOGIN_RATE_LIMIT_BACKEND),
+    ip_limit=settings.LOGIN_RATE_LIMIT_PER_IP,
+    account_limit=settings.LOGIN_RATE_LIMIT_PER_ACCOUNT,
+)
@@ -0,0 +1,198 @@
+# auth/refresh.py
+"""
+Refresh-токены с ротацией и обнаружением повторного использования.
+
+Refresh-токен — случайная строка; в БД хранится только её HMAC-SHA256, поэтому
+обновление access-токена стоит одного поиска по уникальному индексу и одного HMAC,
+а не проверки пароля. Каждое обновление выдаёт новый токен той же цепочки (family),
+старый помечается rotated_at. Предъявление уже ротированного токена означает утечку:
+отзывается вся цепочка и выпущенные access-токены пользователя.
+"""
+import asyncio
+import hashlib
+import hmac
+import logging
+import secrets
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import delete, insert, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from user_management.auth.manager import load_user_by_id
+from user_management.auth.revocation import revoke_user_tokens
+from user_management.cache import TTLCache
+from user_management.config import settings
+from user_management.dependencies import async_session_maker
+from user_management.models.refresh_token import RefreshToken
+from user_management.models.user import User
+
+logger = logging.getLogger(__name__)
+
+# Недавно ротированные токены: hash -> (user_id, family_id).
+# Повтор, пришедший сразу после ротации (типичная атака с украденным токеном),
+# распознаётся без обращения к БД.
+rotated_tokens = TTLCache(
+    maxsize=settings.REFRESH_TOKEN_REUSE_CACHE_SIZE,
+    ttl=settings.REFRESH_TOKEN_EXPIRE_DAYS * 86400,
+)
+
+
+def hash_refresh_token(token: str) -> str:
+    return hmac.new(settings.SECRET_KEY.encode(), token.encode(), hashlib.sha256).hexdigest()
+
+
+def _invalid_token() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Невалидный или просроченный refresh-токен",
+    )
+
+
+async def issue_refresh_token(session: AsyncSession, user_id: int, family_id: Optional[str] = None) -> str:
+    """
+    Создаёт refresh-токен (новую цепочку, если family_id не передан).
+    Коммит выполняет вызывающий код.
+    """
+    token = secrets.token_urlsafe(32)
+    await session.execute(insert(RefreshToken).values(
+        token_hash=hash_refresh_token(token),
+        user_id=user_id,
+        family_id=family_id or uuid.uuid4().hex,
+        expires_at=datetime.now(timezone.utc) + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS),
+    ))
+    return token
+
+
+async def _revoke_family(session: AsyncSession, family_id: str) -> None:
+    await session.execute(
+        update(RefreshToken)
+        .where(RefreshToken.family_id == family_id, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=datetime.now(timezone.utc))
+    )
+    await session.commit()
+
+
+async def revoke_refresh_family(session: AsyncSession, user_id: int, family_id: str) -> None:
+    """
+    Отзывает цепочку refresh-токенов и все access-токены пользователя.
+    """
+    await _revoke_family(session, family_id)
+    revoke_user_tokens(user_id)
+    logger.warning("Повторное использование refresh-токена: цепочка %s пользователя %s отозвана", family_id, user_id)
+
+
+async def rotate_refresh_token(session: AsyncSession, token: str) -> Tuple[User, str]:
+    """
+    Обменивает действующий refresh-токен на новый и возвращает (пользователь, новый токен).
+    Пометка старого токена — один условный UPDATE, поэтому из двух параллельных
+    запросов с одним токеном успешен только первый. Если пользователь удалён или
+    деактивирован, новый токен не выдаётся, а цепочка отзывается.
+    """
+    token_hash = hash_refresh_token(token)
+    reused = rotated_tokens.get(token_hash)
+    if reused is not None:
+        await revoke_refresh_family(session, *reused)
+        raise _invalid_token()
+
+    now = datetime.now(timezone.utc)
+    result = await session.execute(
+        update(RefreshToken)
+        .where(
+            RefreshToken.token_hash == token_hash,
+            RefreshToken.rotated_at.is_(None),
+            RefreshToken.revoked_at.is_(None),
+            RefreshToken.expires_at > now,
+        )
+        .values(rotated_at=now)
+        .returning(RefreshToken.user_id, RefreshToken.family_id)
+    )
+    row = result.first()
+    if row is None:
+        await session.rollback()
+        # Токен не подошёл: проверяем, не был ли он уже ротирован (повтор после вытеснения из LRU)
+        result = await session.execute(
+            select(RefreshToken.user_id, RefreshToken.family_id, RefreshToken.rotated_at)
+            .where(RefreshToken.token_hash == token_hash)
+        )
+        stored = result.first()
+        if stored is not None and stored.rotated_at is not None:
+            await revoke_refresh_family(session, stored.user_id, stored.family_id)
+        raise _invalid_token()
+
+    user_id, family_id = row
+    # Пользователь проверяется до выдачи нового токена (через кэш пользователей)
+    user = await load_user_by_id(user_id)
+    if user is None or not user.is_active:
+        await _revoke_family(session, family_id)
+        logger.info("Refresh-токен неактивного пользователя %s: цепочка %s отозвана", user_id, family_id)
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Пользователь не найден или неактивен",
+        )
+    new_token = await issue_refresh_token(session, user_id, family_id)
+    await session.commit()
+    rotated_tokens.set(token_hash, (user_id, family_id))
+    return user, new_token
+
+
+async def purge_expired_refresh_tokens(session: AsyncSession, now: Optional[datetime] = None,
+                                       batch_size: int = 1000) -> int:
+    """
+    Удаляет истёкшие refresh-токены (по индексу expires_at) пачками по batch_size,
+    чтобы не держать долгую блокировку. Ротированные и отозванные токены хранятся до
+    истечения: по ним распознаётся повторное использование. Возвращает число удалённых.
+    """
+    now = now or datetime.now(timezone.utc)
+    purged = 0
+    while True:
+        expired = select(RefreshToken.id).where(RefreshToken.expires_at <= now).limit(batch_size)
+        result = await session.execute(delete(RefreshToken).where(RefreshToken.id.in_(expired.scalar_subquery())))
+        await session.commit()
+        purged += result.rowcount
+        if result.rowcount < batch_size:
+            return purged
+
+
+class RefreshTokenPurger:
+    """
+    Периодическая очистка истёкших refresh-токенов (запускается в lifespan приложения).
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def run_once(self) -> int:
+        async with async_session_maker() as session:
+            purged = await purge_expired_refresh_tokens(session)
+        if purged:
+            logger.info("Удалено истёкших refresh-токенов: %s", purged)
+        return purged
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception("Ошибка очистки refresh-токенов")
+
+    def start(self) -> None:
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.create_task(self._loop(), name="refresh-token-purger")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+refresh_token_purger = RefreshTokenPurger(settings.REFRESH_TOKEN_PURGE_INTERVAL)
@@ -0,0 +1,50 @@
+# auth/revocation.py
+import time
+from typing import Dict, Optional
+
+# Отзыв токенов без обращения к БД.
+# token_versions: user_id -> текущая версия токенов; токены с меньшей версией недействительны.
+# _denylist: jti -> время истечения (unix), отдельные отозванные токены до их exp.
+# Состояние хранится в памяти процесса и не переживает перезапуск.
+token_versions: Dict[int, int] = {}
+_denylist: Dict[str, float] = {}
+
+
+def current_token_version(user_id: int) -> int:
+    return token_versions.get(user_id, 0)
+
+
+def revoke_user_tokens(user_id: int) -> None:
+    """
+    Отзывает все выпущенные ранее токены пользователя.
+    """
+    token_versions[user_id] = current_token_version(user_id) + 1
+
+
+def _purge_expired(now: float) -> None:
+    for jti in [jti for jti, exp in _denylist.items() if exp <= now]:
+        del _denylist[jti]
+
+
+def revoke_token(jti: str, exp: float) -> None:
+    """
+    Добавляет токен в denylist до момента его истечения.
+    """
+    now = time.time()
+    _purge_expired(now)
+    if exp > now:
+        _denylist[jti] = exp
+
+
+def is_token_revoked(claims: dict) -> bool:
+    """
+    Проверяет jti по denylist и версию токена по карте версий пользователя.
+    """
+    jti: Optional[str] = claims.get("jti")
+    if jti is not None and jti in _denylist:
+        return True
+    version = claims.get("ver")
+    user_id = claims.get("uid")
+    if version is not None and user_id is not None:
+        return version < current_token_version(user_id)
+    return False
@@ -1,8 +1,11 @@
-from typing import Optional
+from typing import List, Optional
 from fastapi_users import schemas
-from pydantic import EmailStr
+from pydantic import BaseModel, EmailStr
 
 class UserRead(schemas.BaseUser[int]):
+    # Схема ответа: email уже проверен при создании (UserCreate), повторная проверка
+    # EmailStr на каждом ответе роняла бы /users/me на сохранённых адресах вроде *.local
+    email: str
     username: str
     full_name: Optional[str]
 
@@ -13,3 +16,16 @@ class UserCreate(schemas.BaseUserCreate):
 class UserUpdate(schemas.BaseUserUpdate):
     username: Optional[str]
     full_name: Optional[str]
+
+class UserImportError(BaseModel):
+    index: int
+    error: str
+
+class UserImportResult(BaseModel):
+    received: int
+    created: int
+    failed: int
+    errors: List[UserImportError]
+
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
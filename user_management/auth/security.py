@@ -1,48 +1,288 @@
 # auth/security.py
-from datetime import datetime, timedelta
-from typing import Any, Dict
-from jose import jwt, JWTError
+import argparse
+import asyncio
+import multiprocessing
+import os
+import secrets
+import sys
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Tuple
+from fastapi import HTTPException, status
 from passlib.context import CryptContext
 
 from user_management.config import settings
 
 
-# Создаем контекст для работы с bcrypt
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+PASSWORD_SCHEMES = ("bcrypt", "argon2")
+
+
+class PasswordService:
+    """
+    Единственная точка хэширования паролей в приложении.
+    Схема (bcrypt/argon2) и стоимость задаются в Settings; хэши другой схемы
+    или с меньшей стоимостью считаются устаревшими (needs_update) и
+    перехэшируются при успешном входе.
+    Реализует PasswordHelperProtocol, поэтому используется и в UserManager fastapi-users.
+    """
+
+    def __init__(self, scheme: str = "bcrypt", bcrypt_rounds: int = 12, argon2_time_cost: int = 3,
+                 argon2_memory_cost: int = 65536, argon2_parallelism: int = 4):
+        if scheme not in PASSWORD_SCHEMES:
+            raise ValueError(f"Неподдерживаемая схема хэширования паролей: {scheme}")
+        self.scheme = scheme
+        self.bcrypt_rounds = bcrypt_rounds
+        self.argon2_time_cost = argon2_time_cost
+        self.argon2_memory_cost = argon2_memory_cost
+        self.argon2_parallelism = argon2_parallelism
+        self._context: Optional[CryptContext] = None
+
+    @property
+    def context(self) -> CryptContext:
+        # CryptContext собирается при первом использовании (или при прогреве в lifespan), не при импорте
+        if self._context is None:
+            other = "argon2" if self.scheme == "bcrypt" else "bcrypt"
+            # Параметры задаются для обеих схем, чтобы хэш можно было проверить при смене схемы;
+            # min_rounds делает хэши с меньшей стоимостью устаревшими
+            self._context = CryptContext(
+                schemes=[self.scheme, other],
+                default=self.scheme,
+                deprecated=[other],
+                bcrypt__default_rounds=self.bcrypt_rounds,
+                bcrypt__min_rounds=self.bcrypt_rounds,
+                argon2__rounds=self.argon2_time_cost,
+                argon2__min_rounds=self.argon2_time_cost,
+                argon2__memory_cost=self.argon2_memory_cost,
+                argon2__parallelism=self.argon2_parallelism,
+            )
+        return self._context
+
+    @classmethod
+    def from_settings(cls) -> "PasswordService":
+        return cls(
+            scheme=settings.PASSWORD_HASH_SCHEME,
+            bcrypt_rounds=settings.PASSWORD_BCRYPT_ROUNDS,
+            argon2_time_cost=settings.PASSWORD_ARGON2_TIME_COST,
+            argon2_memory_cost=settings.PASSWORD_ARGON2_MEMORY_COST,
+            argon2_parallelism=settings.PASSWORD_ARGON2_PARALLELISM,
+        )
+
+    def hash(self, password: str) -> str:
+        return self.context.hash(password)
+
+    def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return self.context.verify(plain_password, hashed_password)
+
+    def verify_and_update(self, plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """
+        Проверяет пароль; если хэш устарел, возвращает новый хэш вторым элементом.
+        """
+        return self.context.verify_and_update(plain_password, hashed_password)
+
+    def needs_update(self, hashed_password: str) -> bool:
+        return self.context.needs_update(hashed_password)
+
+    def generate(self) -> str:
+        return secrets.token_urlsafe()
+
+
+# Создаётся при импорте и в каждом процессе пула, поэтому настройки везде одинаковые;
+# сам CryptContext строится лениво (см. PasswordService.context)
+password_service = PasswordService.from_settings()
+
+def __getattr__(name):
+    # Совместимость: pwd_context без построения CryptContext при импорте модуля
+    if name == "pwd_context":
+        return password_service.context
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """
     Проверяет соответствие обычного пароля и хэшированного.
     """
-    return pwd_context.verify(plain_password, hashed_password)
+    return password_service.verify(plain_password, hashed_password)
+
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Проверяет пароль и возвращает новый хэш, если сохранённый устарел.
+    """
+    return password_service.verify_and_update(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
     """
     Возвращает хэш от заданного пароля.
     """
-    return pwd_context.hash(password)
+    return password_service.hash(password)
 
-def create_access_token(data: Dict[str, Any], expires_delta: timedelta = None) -> str:
+# Пул воркеров для bcrypt: хэширование занимает 100–300 мс CPU и не должно
+# выполняться в event loop, иначе один логин тормозит все остальные запросы.
+_password_executor: Optional[Executor] = None
+_password_semaphore: Optional[asyncio.Semaphore] = None
+_password_pending = 0
+# Отдельный пул процессов для массового импорта, чтобы он не занимал воркеров логина
+_bulk_hash_executor: Optional[ProcessPoolExecutor] = None
+
+def _process_pool(max_workers: int) -> ProcessPoolExecutor:
+    # spawn, а не fork: в процессе сервера уже работают потоки (QueueListener логов,
+    # пул хэширования, aiosqlite), и fork может унаследовать захваченные ими блокировки
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+
+def get_password_executor() -> Executor:
     """
-    Создает JWT-токен, включающий данные и срок действия.
+    Возвращает (лениво создаёт) пул для хэширования паролей.
+    Тип пула и число воркеров задаются в Settings.
     """
-    to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        # По умолчанию токен действует 15 минут.
-        expire = datetime.utcnow() + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
-    return encoded_jwt
+    global _password_executor
+    if _password_executor is None:
+        if settings.PASSWORD_HASH_EXECUTOR == "process":
+            _password_executor = _process_pool(settings.PASSWORD_HASH_WORKERS)
+        else:
+            _password_executor = ThreadPoolExecutor(
+                max_workers=settings.PASSWORD_HASH_WORKERS,
+                thread_name_prefix="password-hash",
+            )
+    return _password_executor
 
-def decode_access_token(token: str) -> Dict[str, Any]:
+async def run_in_password_pool(func: Callable, *args):
     """
-    Декодирует JWT-токен и возвращает данные.
-    Если токен недействителен, выбрасывает исключение.
+    Выполняет func(*args) в пуле хэширования с ограничением параллелизма.
+    Если очередь ожидающих задач переполнена, отвечает 503.
     """
+    global _password_semaphore, _password_pending
+    if _password_pending >= settings.PASSWORD_HASH_WORKERS + settings.PASSWORD_HASH_QUEUE_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Сервер перегружен, повторите попытку позже",
+        )
+    if _password_semaphore is None:
+        _password_semaphore = asyncio.Semaphore(settings.PASSWORD_HASH_WORKERS)
+    _password_pending += 1
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        return payload
-    except JWTError as e:
-        raise JWTError("Could not validate token") from e
+        async with _password_semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(get_password_executor(), func, *args)
+    finally:
+        _password_pending -= 1
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """
+    Асинхронная проверка пароля в пуле воркеров.
+    """
+    return await run_in_password_pool(verify_password, plain_password, hashed_password)
+
+async def verify_and_update_password_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Асинхронная проверка пароля с перехэшированием устаревшего хэша.
+    """
+    return await run_in_password_pool(verify_and_update_password, plain_password, hashed_password)
+
+# Хэш случайного пароля с текущими параметрами: проверка против него стоит столько же,
+# сколько проверка настоящего пароля, поэтому время ответа не выдаёт существование email
+_dummy_password_hash: Optional[str] = None
+
+async def get_dummy_password_hash() -> str:
+    """
+    Возвращает (при первом вызове — вычисляет в пуле) хэш для фиктивной проверки.
+    """
+    global _dummy_password_hash
+    if _dummy_password_hash is None:
+        _dummy_password_hash = await run_in_password_pool(get_password_hash, secrets.token_urlsafe())
+    return _dummy_password_hash
+
+async def verify_password_or_dummy(plain_password: str, hashed_password: Optional[str]) -> Tuple[bool, Optional[str]]:
+    """
+    Проверка пароля при входе с одинаковой стоимостью для известных и неизвестных email:
+    если пользователя нет (hashed_password is None), выполняется фиктивная проверка
+    в том же пуле и возвращается (False, None).
+    """
+    if hashed_password is None:
+        await run_in_password_pool(verify_password, plain_password, await get_dummy_password_hash())
+        return False, None
+    return await verify_and_update_password_async(plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """
+    Асинхронное хэширование пароля в пуле воркеров.
+    """
+    return await run_in_password_pool(get_password_hash, password)
+
+async def hash_passwords_bulk(passwords: list) -> list:
+    """
+    Хэширует пачку паролей параллельно во всех процессах пула массового импорта.
+    """
+    global _bulk_hash_executor
+    if _bulk_hash_executor is None:
+        _bulk_hash_executor = _process_pool(settings.BULK_IMPORT_HASH_WORKERS or os.cpu_count())
+    loop = asyncio.get_running_loop()
+    return await asyncio.gather(*(
+        loop.run_in_executor(_bulk_hash_executor, get_password_hash, password)
+        for password in passwords
+    ))
+
+def shutdown_password_executor() -> None:
+    """
+    Останавливает пулы хэширования (вызывается при остановке приложения).
+    """
+    global _password_executor, _password_semaphore, _bulk_hash_executor
+    if _password_executor is not None:
+        _password_executor.shutdown(wait=False, cancel_futures=True)
+        _password_executor = None
+    if _bulk_hash_executor is not None:
+        _bulk_hash_executor.shutdown(wait=False, cancel_futures=True)
+        _bulk_hash_executor = None
+    _password_semaphore = None
+
+def measure_verify_ms(service: PasswordService, samples: int = 3) -> float:
+    """
+    Медианное время проверки пароля (мс) для заданных параметров.
+    """
+    hashed = service.hash("calibration-password")
+    timings = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        service.verify("calibration-password", hashed)
+        timings.append((time.perf_counter() - start) * 1000)
+    return sorted(timings)[len(timings) // 2]
+
+def calibrate(scheme: str, target_ms: float) -> Tuple[Dict[str, int], float]:
+    """
+    Подбирает наибольшую стоимость, при которой проверка пароля укладывается в target_ms.
+    Для argon2 подбирается time_cost при memory_cost и parallelism из Settings.
+    Возвращает (настройки для Settings, измеренное время).
+    """
+    if scheme == "bcrypt":
+        name, costs = "PASSWORD_BCRYPT_ROUNDS", range(8, 18)
+        make = lambda cost: PasswordService("bcrypt", bcrypt_rounds=cost)
+    else:
+        name, costs = "PASSWORD_ARGON2_TIME_COST", range(1, 21)
+        make = lambda cost: PasswordService(
+            "argon2",
+            argon2_time_cost=cost,
+            argon2_memory_cost=settings.PASSWORD_ARGON2_MEMORY_COST,
+            argon2_parallelism=settings.PASSWORD_ARGON2_PARALLELISM,
+        )
+    best, best_ms = costs[0], measure_verify_ms(make(costs[0]))
+    for cost in costs[1:]:
+        elapsed = measure_verify_ms(make(cost))
+        if elapsed > target_ms:
+            break
+        best, best_ms = cost, elapsed
+    return {name: best}, best_ms
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Подобрать стоимость хэширования паролей под целевое время проверки на этом железе",
+    )
+    parser.add_argument("--scheme", choices=PASSWORD_SCHEMES, default=settings.PASSWORD_HASH_SCHEME)
+    parser.add_argument("--target-ms", type=float, default=250.0, help="Целевое время одной проверки пароля")
+    args = parser.parse_args(argv)
+
+    values, elapsed = calibrate(args.scheme, args.target_ms)
+    print(f"PASSWORD_HASH_SCHEME={args.scheme}")
+    for name, value in values.items():
+        print(f"{name}={value}")
+    print(f"# проверка пароля: {elapsed:.1f} мс (цель {args.target_ms:.0f} мс)", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -11,16 +11,122 @@ class Settings(BaseSettings):
     DATABASE_URL: str = "sqlite+aiosqlite:///./sql_app.db"
     SQL_DATABASE_URL: str = os.getenv("SQL_DATABASE_URL", "sqlite+aiosqlite:///./sql_app.db")
 
+    # Настройки пула соединений (один общий engine на всё приложение)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_ECHO: bool = False
+    # Сколько соединений пула открыть при старте, до приёма запросов (0 — не прогревать)
+    DB_POOL_PREWARM: int = 0
+
+    # Запуск: один раунд хэширования пароля до готовности (первый вход не платит за загрузку
+    # бэкенда bcrypt/argon2)
+    PASSWORD_HASH_PREWARM: bool = True
+
     # Настройки безопасности
     SECRET_KEY: str = os.getenv("SECRET_KEY", "supersecretkey")
     ALGORITHM: str = "HS256"
-    ACCESS_TOKEN_EXPIRE_MINUTES: int = 60
+    # Access-токены короткоживущие: продление — через refresh-токен, без проверки пароля
+    ACCESS_TOKEN_EXPIRE_MINUTES: int = 15
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 30
+    # Сколько недавно ротированных refresh-токенов помнить для быстрого обнаружения повтора
+    REFRESH_TOKEN_REUSE_CACHE_SIZE: int = 10000
+    # Как часто (с) удалять истёкшие refresh-токены (0 — не удалять в приложении)
+    REFRESH_TOKEN_PURGE_INTERVAL: int = 3600
+    # Stateless-токены: id и флаги пользователя в claims, проверка без запроса к БД
+    STATELESS_TOKENS_ENABLED: bool = False
+    # Асимметричная подпись JWT: путь к JSON-связке ключей (пусто — HS256 и SECRET_KEY)
+    JWT_KEYRING_PATH: str = ""
+    # Сколько секунд клиенты могут кэшировать /.well-known/jwks.json
+    JWKS_CACHE_MAX_AGE: int = 300
+
+    # Ограничение неудачных входов: окно (с), лимиты по IP и учётной записи,
+    # экспоненциальная блокировка base * 2^n секунд, но не больше max
+    LOGIN_RATE_LIMIT_ENABLED: bool = True
+    LOGIN_RATE_LIMIT_BACKEND: str = "memory"
+    LOGIN_RATE_LIMIT_WINDOW: int = 300
+    LOGIN_RATE_LIMIT_PER_IP: int = 20
+    LOGIN_RATE_LIMIT_PER_ACCOUNT: int = 5
+    LOGIN_RATE_LIMIT_BACKOFF_BASE: float = 1.0
+    LOGIN_RATE_LIMIT_BACKOFF_MAX: float = 900.0
+    LOGIN_RATE_LIMIT_MAXSIZE: int = 100000
+
+    # Хэширование паролей: схема ("bcrypt" или "argon2") и стоимость.
+    # Подобрать под железо: python -m user_management.auth.security --target-ms 250
+    PASSWORD_HASH_SCHEME: str = "bcrypt"
+    PASSWORD_BCRYPT_ROUNDS: int = 12
+    PASSWORD_ARGON2_TIME_COST: int = 3
+    PASSWORD_ARGON2_MEMORY_COST: int = 65536  # КиБ
+    PASSWORD_ARGON2_PARALLELISM: int = 4
+
+    # Пул для хэширования паролей (bcrypt не должен блокировать event loop)
+    PASSWORD_HASH_EXECUTOR: str = "thread"  # "thread" или "process"
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_QUEUE_SIZE: int = 100
+
+    # Массовый импорт пользователей: размер пачки и число процессов для хэширования (0 — по числу CPU)
+    BULK_IMPORT_CHUNK_SIZE: int = 1000
+    BULK_IMPORT_HASH_WORKERS: int = 0
+
+    # Настройки кэша аутентифицированных пользователей
+    USER_CACHE_ENABLED: bool = True
+    USER_CACHE_MAXSIZE: int = 10000
+    USER_CACHE_TTL: int = 60
+
+    # Кэш уже проверенных JWT-токенов (ключ — хэш токена, живёт до exp)
+    TOKEN_CACHE_ENABLED: bool = True
+    TOKEN_CACHE_MAXSIZE: int = 10000
+
+    # Кэш погоды по городам
+    WEATHER_CACHE_BACKEND: str = "memory"
+    WEATHER_CACHE_MAXSIZE: int = 1000
+    WEATHER_CACHE_TTL: int = 300
+
+    # Пакетная загрузка погоды: размер пачки на одну транзакцию
+    WEATHER_BULK_CHUNK_SIZE: int = 500
+
+    # Логирование: уровень, формат (text/json), запись через очередь, доля DEBUG-записей
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "text"
+    LOG_ASYNC: bool = True
+    LOG_DEBUG_SAMPLE_RATE: float = 1.0
+
+    # Метрики производительности (Prometheus, /metrics)
+    METRICS_ENABLED: bool = True
 
     # Настройки CORS
     ALLOWED_ORIGINS: list[str] = ["*"]
 
     # Настройки OpenWeather
     OPENWEATHER_API_KEY: str = os.getenv("OPENWEATHER_API_KEY", "")
+    OPENWEATHER_BASE_URL: str = "https://api.openweathermap.org"
+    OPENWEATHER_TIMEOUT: float = 5.0
+    # Общий пул keep-alive соединений и лимит одновременных запросов к API
+    OPENWEATHER_MAX_CONNECTIONS: int = 20
+    OPENWEATHER_CONCURRENCY: int = 10
+    # Запрашивать живую погоду, если в БД нет данных по городу или они старше WEATHER_LIVE_MAX_AGE секунд
+    WEATHER_LIVE_FETCH_ENABLED: bool = False
+    WEATHER_LIVE_MAX_AGE: int = 600
+    # Фоновое обновление популярных городов (нужен WEATHER_LIVE_FETCH_ENABLED):
+    # top-N городов по частоте запросов обновляются за WEATHER_REFRESH_AHEAD секунд до устаревания,
+    # со случайным сдвигом до WEATHER_REFRESH_JITTER и не чаще бюджета запросов в минуту
+    WEATHER_REFRESHER_ENABLED: bool = False
+    WEATHER_REFRESH_TOP_N: int = 20
+    WEATHER_REFRESH_INTERVAL: float = 15.0
+    WEATHER_REFRESH_AHEAD: int = 120
+    WEATHER_REFRESH_JITTER: float = 60.0
+    WEATHER_REFRESH_BUDGET_PER_MINUTE: int = 30
+    WEATHER_POPULARITY_HALF_LIFE: float = 900.0
+
+    def get_database_url(self) -> str:
+        """
+        URL базы приложения: при TESTING=1 — SQL_DATABASE_URL (SQLite для тестов), иначе DATABASE_URL.
+        """
+        if os.getenv("TESTING") == "1":
+            return self.SQL_DATABASE_URL
+        return self.DATABASE_URL
 
     # Динамическое определение базы данных в зависимости от окружения
     @property
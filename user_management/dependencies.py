@@ -1,26 +1,106 @@
+import asyncio
 import logging
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from typing import Optional
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 from user_management.config import settings
+from user_management.logging_config import setup_logging
+from user_management.metrics import InstrumentedAsyncAdaptedQueuePool, instrument_engine, uninstrument_engine
 
-# Инициализация логирования
+# Инициализация логирования (настройка выполняется один раз, см. logging_config.py)
 def init_logging():
-    logging.basicConfig(
-        level=logging.INFO,
-        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    )
+    setup_logging()
     logger = logging.getLogger(settings.APP_NAME)
     return logger
 
-# Инициализация базы данных
-engine = create_async_engine(settings.DATABASE_URL, echo=True)
-async_session_maker = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+# Фабрика engine: параметры пула и логирование SQL берутся из Settings
+def create_engine(database_url: str = None) -> AsyncEngine:
+    url = make_url(database_url or settings.get_database_url())
+    options = {
+        "echo": settings.DB_ECHO,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+    }
+    # SQLite в памяти работает на StaticPool, размер пула к нему неприменим
+    if not (url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")):
+        options.update(
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+        )
+        if settings.METRICS_ENABLED:
+            options["poolclass"] = InstrumentedAsyncAdaptedQueuePool
+    new_engine = create_async_engine(url, **options)
+    if settings.METRICS_ENABLED:
+        instrument_engine(new_engine)
+    return new_engine
 
-async def init_database():
-    async with engine.begin() as conn:
-        # Здесь можно выполнить миграции или другие действия
-        pass
+# Единственный engine и фабрика сессий приложения. Создаются при первом обращении
+# (или в lifespan приложения), а не при импорте модуля
+_engine: Optional[AsyncEngine] = None
+_session_maker: Optional[sessionmaker] = None
+
+def get_engine() -> AsyncEngine:
+    global _engine, _session_maker
+    if _engine is None:
+        _engine = create_engine()
+        _session_maker = sessionmaker(_engine, class_=AsyncSession, expire_on_commit=False)
+    return _engine
+
+def async_session_maker(**kwargs) -> AsyncSession:
+    """
+    Новая сессия общего engine (используется как async_session_maker() в async with).
+    """
+    get_engine()
+    return _session_maker(**kwargs)
+
+def __getattr__(name):
+    # Совместимость: from user_management.dependencies import engine
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+async def _prewarm_connection(engine: AsyncEngine, ready: asyncio.Event, opened: list, count: int) -> None:
+    try:
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+            opened.append(conn)
+            if len(opened) >= count:
+                ready.set()
+            # Соединение держится, пока не откроются все: иначе пул отдаст одно и то же повторно
+            await ready.wait()
+    except BaseException:
+        ready.set()
+        raise
+
+async def init_database(prewarm: int = 0) -> int:
+    """
+    Создаёт engine и открывает до prewarm соединений пула (не больше pool_size).
+    Возвращает число прогретых соединений.
+    """
+    engine = get_engine()
+    pool_size = engine.pool.size() if hasattr(engine.pool, "size") else 1
+    count = min(prewarm, pool_size)
+    if count <= 0:
+        return 0
+    ready, opened = asyncio.Event(), []
+    await asyncio.gather(*(_prewarm_connection(engine, ready, opened, count) for _ in range(count)))
+    return len(opened)
+
+async def dispose_database():
+    """
+    Закрывает соединения пула; следующий вызов get_engine() создаст engine заново.
+    """
+    global _engine, _session_maker
+    if _engine is not None:
+        await _engine.dispose()
+        if settings.METRICS_ENABLED:
+            uninstrument_engine()
+        _engine = None
+        _session_maker = None
 
 async def get_db():
     async with async_session_maker() as session:
-        yield session
\ No newline at end of file
+        yield session
@@ -0,0 +1,115 @@
+# logging_config.py
+import atexit
+import json
+import logging
+import queue
+import random
+import sys
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+from uuid import UUID
+
+from user_management.config import settings
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+_listener: Optional[QueueListener] = None
+_configured = False
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Форматирует запись в одну JSON-строку (для сборщиков логов).
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            data["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False)
+
+
+class DebugSamplingFilter(logging.Filter):
+    """
+    Пропускает только долю DEBUG-записей, остальные уровни — всегда.
+    """
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.rate >= 1.0:
+            return True
+        return random.random() < self.rate
+
+
+# Неизменяемые скаляры безопасно передавать в поток записи как есть
+_IMMUTABLE_ARG_TYPES = (str, int, float, bool, bytes, type(None), Decimal, UUID, datetime, date)
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    QueueHandler, который не форматирует сообщение в вызывающем потоке:
+    форматирование и запись выполняет поток QueueListener, а не event loop.
+    Если среди аргументов есть изменяемые объекты (ORM-сущности, словари),
+    сообщение форматируется сразу: к моменту записи они могут измениться
+    или обращаться к уже закрытой сессии.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        args = record.args
+        if args and not (isinstance(args, tuple) and all(isinstance(arg, _IMMUTABLE_ARG_TYPES) for arg in args)):
+            try:
+                record.msg = record.getMessage()
+            except Exception:
+                # Ошибку шаблона сообщит handleError в потоке записи
+                return record
+            record.args = None
+        return record
+
+
+def setup_logging() -> None:
+    """
+    Один раз настраивает корневой логгер по Settings:
+    уровень, формат (text/json), асинхронную запись через очередь и сэмплирование DEBUG.
+    """
+    global _listener, _configured
+    if _configured:
+        return
+    _configured = True
+
+    formatter = JsonFormatter() if settings.LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT)
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(formatter)
+
+    root = logging.getLogger()
+    root.setLevel(settings.LOG_LEVEL.upper())
+
+    if settings.LOG_ASYNC:
+        log_queue = queue.SimpleQueue()
+        handler = DeferredQueueHandler(log_queue)
+        _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logging)
+    else:
+        handler = stream_handler
+    handler.addFilter(DebugSamplingFilter(settings.LOG_DEBUG_SAMPLE_RATE))
+    root.addHandler(handler)
+
+
+def shutdown_logging() -> None:
+    """
+    Дописывает очередь и останавливает поток записи логов.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
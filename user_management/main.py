@@ -1,20 +1,77 @@
 # main.py
+import time
 
+# Отсчёт холодного старта: от импорта приложения до готовности принимать запросы
+_import_started = time.perf_counter()
+
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from user_management.config import settings
-from user_management.dependencies import init_logging, init_database
+from user_management.dependencies import init_logging, init_database, dispose_database
 from user_management.routers import user_router, weather_router, router
-from user_management.auth.auth_routes import router as auth_router
+from user_management.auth.auth_routes import router as auth_router, well_known_router
+from user_management.auth.security import get_dummy_password_hash, shutdown_password_executor
+from user_management.auth.permissions import refresh_roles
+from user_management.auth.auth import token_cache
+from user_management.auth.refresh import refresh_token_purger
+from user_management.auth.manager import user_cache
+from user_management.weather import weather_cache, weather_refresher
+from user_management.openweather import openweather_client
+from user_management.responses import FastJSONResponse
+from user_management.metrics import MetricsMiddleware, app_startup_seconds, register_cache, router as metrics_router
 
 # Инициализация логирования
 logger = init_logging()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Запуск и остановка приложения: engine, пулы и хэшер создаются здесь один раз,
+    при остановке всё освобождается в обратном порядке.
+    """
+    started = time.perf_counter()
+    logger.info("Запуск приложения...")
+    prewarmed = await init_database(prewarm=settings.DB_POOL_PREWARM)
+    try:
+        await refresh_roles()
+    except Exception as e:
+        # Без таблицы ролей приложение работает, но проверки разрешений пройдут только суперпользователи
+        logger.warning("Не удалось загрузить роли: %s", e)
+    if settings.PASSWORD_HASH_PREWARM:
+        # Хэш для фиктивной проверки пароля считается заранее, а не на первом входе с неизвестным email:
+        # заодно загружается бэкенд bcrypt/argon2 и поднимается пул хэширования
+        await get_dummy_password_hash()
+    if settings.WEATHER_REFRESHER_ENABLED and settings.WEATHER_LIVE_FETCH_ENABLED:
+        weather_refresher.start()
+    refresh_token_purger.start()
+    ready = time.perf_counter()
+    app_startup_seconds.set("import", value=started - _import_started)
+    app_startup_seconds.set("lifespan", value=ready - started)
+    app_startup_seconds.set("total", value=ready - _import_started)
+    logger.info("Приложение запущено за %.3f с (импорт %.3f с, lifespan %.3f с), прогрето соединений: %s",
+                ready - _import_started, started - _import_started, ready - started, prewarmed)
+    try:
+        yield
+    finally:
+        logger.info("Остановка приложения...")
+        await weather_refresher.stop()
+        await refresh_token_purger.stop()
+        shutdown_password_executor()
+        await openweather_client.aclose()
+        await dispose_database()
+        logger.info("Приложение успешно остановлено.")
+
+
 # Создание приложения FastAPI
 app = FastAPI(
     title="Test Project",
     description="API для тестового проекта",
     version="1.0.0",
+    # orjson вместо стандартного json для всех ответов
+    default_response_class=FastJSONResponse,
+    lifespan=lifespan,
 )
 
 # Настройка CORS
@@ -26,8 +83,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Метрики производительности: middleware подключается последним, чтобы измерять весь стек
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+    app.include_router(metrics_router)
+    register_cache("users", user_cache)
+    register_cache("tokens", token_cache)
+    register_cache("weather", weather_cache)
+
 # Подключение маршрутов
 app.include_router(auth_router, prefix="/auth", tags=["Authentication"])
+app.include_router(well_known_router, tags=["Authentication"])
 app.include_router(user_router, prefix="/users", tags=["Users"])
 app.include_router(weather_router, prefix="/weather", tags=["Weather"])
 app.include_router(router)
@@ -37,19 +103,6 @@ app.include_router(router)
 def test_route():
     return {"message": "API работает корректно!"}
 
-# Событие запуска приложения
-@app.on_event("startup")
-async def startup_event():
-    logger.info("Запуск приложения...")
-    await init_database()
-    logger.info("Приложение успешно запущено.")
-
-# Событие остановки приложения
-@app.on_event("shutdown")
-async def shutdown_event():
-    logger.info("Остановка приложения...")
-    logger.info("Приложение успешно остановлено.")
-
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("main:app", host="127.0.0.1", port=8000, reload=True)
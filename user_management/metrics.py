@@ -0,0 +1,315 @@
+# metrics.py
+import bisect
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+# Стандартные границы бакетов Prometheus для времени ответа (секунды)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Counter:
+    """
+    Монотонный счётчик с метками.
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels, amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels) -> float:
+        return self._values.get(labels, 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for labels, value in self._values.items():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Gauge(Counter):
+    """
+    Значение, которое может расти и уменьшаться.
+    """
+
+    def dec(self, *labels, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels, value: float) -> None:
+        self._values[labels] = value
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+
+class Histogram:
+    """
+    Гистограмма с фиксированными бакетами. observe() — O(log n) по числу бакетов.
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # метки -> [счётчики по бакетам (не накопительные) + "+Inf", сумма, количество]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels) -> None:
+        item = self._values.get(labels)
+        if item is None:
+            item = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        item[0][bisect.bisect_left(self.buckets, value)] += 1
+        item[1] += value
+        item[2] += 1
+
+    def totals(self, *labels) -> Tuple[float, int]:
+        """
+        Возвращает (сумма, количество) наблюдений для набора меток.
+        """
+        item = self._values.get(labels)
+        if item is None:
+            return 0.0, 0
+        return item[1], item[2]
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total, count) in self._values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                le_label = f'le="{le}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le_label)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+class Registry:
+    """
+    Набор метрик и коллекторов, собираемых в текстовый формат Prometheus.
+    Коллектор — функция без аргументов, возвращающая готовые строки экспозиции.
+    Коллекторы хранятся по имени: повторная регистрация заменяет прежний
+    (например, пула пересозданного engine), а не дублирует семейство метрик.
+    """
+
+    def __init__(self):
+        self._metrics: list = []
+        self._collectors: Dict[str, Callable[[], List[str]]] = {}
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], List[str]], name: Optional[str] = None) -> None:
+        self._collectors[name or collector.__name__] = collector
+
+    def remove_collector(self, name: str) -> None:
+        self._collectors.pop(name, None)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collector in list(self._collectors.values()):
+            lines.extend(collector())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests_total = registry.register(Counter(
+    "http_requests_total", "Количество HTTP-запросов", ("method", "route", "status"),
+))
+http_request_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "Время обработки HTTP-запроса", ("method", "route"),
+))
+http_requests_in_progress = registry.register(Gauge(
+    "http_requests_in_progress", "Запросы, обрабатываемые в данный момент",
+))
+db_queries_per_request = registry.register(Histogram(
+    "db_queries_per_request", "Число SQL-запросов на HTTP-запрос", ("route",), buckets=QUERY_COUNT_BUCKETS,
+))
+db_time_per_request = registry.register(Histogram(
+    "db_time_per_request_seconds", "Суммарное время SQL-запросов на HTTP-запрос", ("route",),
+))
+db_pool_checkout_wait = registry.register(Histogram(
+    "db_pool_checkout_wait_seconds", "Время ожидания соединения из пула",
+))
+login_rate_limit_decisions = registry.register(Counter(
+    "login_rate_limit_decisions_total", "Проверки лимита попыток входа", ("scope", "decision"),
+))
+login_rate_limit_failures = registry.register(Counter(
+    "login_rate_limit_failures_total", "Неудачные попытки входа, учтённые лимитером", ("scope", "result"),
+))
+weather_refreshes = registry.register(Counter(
+    "weather_background_refreshes_total", "Фоновые обновления погоды", ("result",),
+))
+app_startup_seconds = registry.register(Gauge(
+    "app_startup_seconds", "Длительность холодного старта по фазам", ("phase",),
+))
+
+# Статистика БД текущего запроса: [число запросов, суммарное время]
+_request_db_stats: ContextVar[Optional[list]] = ContextVar("request_db_stats", default=None)
+
+
+class MetricsMiddleware:
+    """
+    ASGI-middleware: время ответа по маршрутам, коды ответов, запросы в работе
+    и статистика БД на запрос. Без BaseHTTPMiddleware, чтобы не добавлять накладных расходов.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        db_stats = [0, 0.0]
+        token = _request_db_stats.set(db_stats)
+        http_requests_in_progress.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - start
+            http_requests_in_progress.dec()
+            _request_db_stats.reset(token)
+            route = scope.get("route")
+            # Шаблон пути, а не сам путь, чтобы не плодить метки
+            route_path = getattr(route, "path", "<unmatched>")
+            method = scope["method"]
+            http_requests_total.inc(method, route_path, str(status_code))
+            http_request_duration.observe(duration, method, route_path)
+            db_queries_per_request.observe(db_stats[0], route_path)
+            db_time_per_request.observe(db_stats[1], route_path)
+
+
+class InstrumentedAsyncAdaptedQueuePool(AsyncAdaptedQueuePool):
+    """
+    Пул соединений, измеряющий время ожидания свободного соединения.
+    """
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            db_pool_checkout_wait.observe(time.perf_counter() - start)
+
+
+POOL_COLLECTOR = "db_pool"
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """
+    Подписывается на события engine: учитывает число и время SQL-запросов
+    текущего HTTP-запроса и публикует состояние пула.
+    """
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        stats = _request_db_stats.get()
+        if stats is not None:
+            stats[0] += 1
+            stats[1] += elapsed
+
+    def collect_pool() -> List[str]:
+        pool = sync_engine.pool
+        if not hasattr(pool, "checkedout"):
+            return []
+        return [
+            "# HELP db_pool_checked_out Соединения, выданные из пула",
+            "# TYPE db_pool_checked_out gauge",
+            f"db_pool_checked_out {pool.checkedout()}",
+            "# HELP db_pool_overflow Соединения сверх размера пула",
+            "# TYPE db_pool_overflow gauge",
+            f"db_pool_overflow {pool.overflow()}",
+        ]
+
+    registry.add_collector(collect_pool, name=POOL_COLLECTOR)
+
+
+def uninstrument_engine() -> None:
+    """
+    Снимает коллектор пула закрытого engine, чтобы он не держал engine в памяти.
+    """
+    registry.remove_collector(POOL_COLLECTOR)
+
+
+_caches: Dict[str, object] = {}
+
+
+def register_cache(name: str, cache) -> None:
+    """
+    Публикует статистику кэша (TTLCache или CacheBackend) с меткой cache=name.
+    """
+    _caches[name] = cache
+
+
+def _collect_caches() -> List[str]:
+    stats = {name: cache.stats() for name, cache in _caches.items()}
+    lines: List[str] = []
+    for metric, key, kind, documentation in (
+        ("cache_hits_total", "hits", "counter", "Попадания в кэш"),
+        ("cache_misses_total", "misses", "counter", "Промахи кэша"),
+        ("cache_size", "size", "gauge", "Число записей в кэше"),
+    ):
+        lines.append(f"# HELP {metric} {documentation}")
+        lines.append(f"# TYPE {metric} {kind}")
+        for name, values in stats.items():
+            lines.append(f'{metric}{{cache="{_escape(name)}"}} {values[key]}')
+    return lines
+
+
+registry.add_collector(_collect_caches)
+
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
@@ -1,3 +1,4 @@
 from .base import Base
 from .role import Role
 from .user import User
+from .refresh_token import RefreshToken
@@ -1,11 +1,22 @@
-from sqlalchemy import Column, Integer, String, Float
+from datetime import datetime, timezone
+from sqlalchemy import Column, Integer, String, Float, DateTime, Index
+from sqlalchemy.sql import func
 from user_management.models.base import Base
 
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
 class Weather(Base):
     __tablename__ = "weather"
 
     id = Column(Integer, primary_key=True, index=True)
-    city = Column(String, index=True, nullable=False)
+    city = Column(String, nullable=False)
     temperature = Column(Float, nullable=False)
     humidity = Column(Integer, nullable=False)
-    description = Column(String, nullable=False)
\ No newline at end of file
+    description = Column(String, nullable=False)
+    observed_at = Column(DateTime(timezone=True), nullable=False, default=utcnow, server_default=func.now())
+
+    # Последнее наблюдение по городу и история по времени читаются по одному индексу
+    __table_args__ = (
+        Index("ix_weather_city_observed_at", city, observed_at.desc()),
+    )
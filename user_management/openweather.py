@@ -0,0 +1,126 @@
+# openweather.py
+"""
+Асинхронный клиент OpenWeather.
+
+Один общий httpx.AsyncClient с keep-alive соединениями на всё приложение,
+ограничение числа одновременных запросов к API и single-flight: параллельные
+запросы по одному ключу (городу) ждут один и тот же вызов.
+Базовый URL настраивается (OPENWEATHER_BASE_URL), тесты используют локальную заглушку.
+"""
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import httpx
+
+from user_management.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class OpenWeatherError(Exception):
+    """
+    API OpenWeather недоступно или вернуло неожиданный ответ.
+    """
+
+
+class SingleFlight:
+    """
+    Объединяет одновременные вызовы с одинаковым ключом в один.
+    Отмена одного из ожидающих не отменяет общий вызов для остальных.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Future] = {}
+
+    async def do(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        future = self._calls.get(key)
+        if future is None:
+            future = asyncio.ensure_future(func())
+            self._calls[key] = future
+            future.add_done_callback(lambda _: self._calls.pop(key, None))
+        return await asyncio.shield(future)
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+
+class OpenWeatherClient:
+    """
+    Клиент текущей погоды (/data/2.5/weather). HTTP-клиент создаётся при первом запросе.
+    """
+
+    def __init__(self, base_url: str, api_key: str, timeout: float = 5.0,
+                 max_connections: int = 20, concurrency: int = 10):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.concurrency = concurrency
+        self.requests_sent = 0
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    @classmethod
+    def from_settings(cls) -> "OpenWeatherClient":
+        return cls(
+            base_url=settings.OPENWEATHER_BASE_URL,
+            api_key=settings.OPENWEATHER_API_KEY,
+            timeout=settings.OPENWEATHER_TIMEOUT,
+            max_connections=settings.OPENWEATHER_MAX_CONNECTIONS,
+            concurrency=settings.OPENWEATHER_CONCURRENCY,
+        )
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+            )
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._client
+
+    async def current_weather(self, city: str) -> Optional[dict]:
+        """
+        Возвращает текущую погоду в формате WeatherCreate или None, если город не найден.
+        """
+        client = self._get_client()
+        async with self._semaphore:
+            self.requests_sent += 1
+            try:
+                response = await client.get("/data/2.5/weather", params={
+                    "q": city,
+                    "appid": self.api_key,
+                    "units": "metric",
+                })
+            except httpx.HTTPError as e:
+                raise OpenWeatherError(f"Ошибка запроса к OpenWeather: {e}") from e
+        if response.status_code == 404:
+            return None
+        if response.status_code != 200:
+            raise OpenWeatherError(f"OpenWeather ответил {response.status_code}")
+        try:
+            data = response.json()
+            return {
+                "city": city,
+                "temperature": float(data["main"]["temp"]),
+                "humidity": int(data["main"]["humidity"]),
+                "description": data["weather"][0]["description"],
+                "observed_at": datetime.fromtimestamp(data["dt"], timezone.utc),
+            }
+        except (ValueError, KeyError, IndexError, TypeError) as e:
+            raise OpenWeatherError(f"Неожиданный ответ OpenWeather: {e}") from e
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            self._semaphore = None
+
+
+openweather_client = OpenWeatherClient.from_settings()
@@ -0,0 +1,22 @@
+# responses.py
+"""
+Быстрая JSON-сериализация ответов через orjson.
+
+FastJSONResponse — класс ответа по умолчанию для всего приложения. Эндпоинты,
+отдающие большие списки строк из типизированных select по колонкам, возвращают
+FastJSONResponse напрямую: такие строки уже имеют нужные типы, и поэлементная
+валидация pydantic не нужна.
+"""
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+def json_dumps(content: Any) -> bytes:
+    return orjson.dumps(content)
@@ -1,4 +1,6 @@
-from pydantic import BaseModel
+from datetime import datetime
+from typing import Dict, List, Optional
+from pydantic import BaseModel, ConfigDict
 
 class WeatherBase(BaseModel):
     city: str
@@ -7,10 +9,43 @@ class WeatherBase(BaseModel):
     description: str
 
 class WeatherCreate(WeatherBase):
-    pass
+    # Время наблюдения; если не передано, используется текущее
+    observed_at: Optional[datetime] = None
 
 class WeatherResponse(WeatherBase):
+    model_config = ConfigDict(from_attributes=True)
+
     id: int
+    observed_at: datetime
+
+class WeatherBulkError(BaseModel):
+    index: int
+    error: str
+
+class WeatherBulkResult(BaseModel):
+    received: int
+    inserted: int
+    updated: int
+    # Строки upsert, перекрытые более поздней строкой того же города в той же пачке
+    collapsed: int = 0
+    failed: int
+    errors: List[WeatherBulkError]
+
+class MetricStats(BaseModel):
+    min: float
+    max: float
+    mean: float
+    # Ключи вида "p50", "p99"
+    percentiles: Dict[str, Optional[float]]
+
+class WeatherStats(BaseModel):
+    # None — агрегат по всем городам
+    city: Optional[str]
+    count: int
+    temperature: MetricStats
+    humidity: MetricStats
 
-    class Config:
-        orm_mode = True
\ No newline at end of file
+class WeatherStatsResponse(BaseModel):
+    since: Optional[datetime]
+    until: Optional[datetime]
+    stats: List[WeatherStats]
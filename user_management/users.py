@@ -1,55 +1,94 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from user_management.dependencies import get_db
+from user_management.dependencies import get_db, async_session_maker
 from user_management.models.user import User
 from sqlalchemy.future import select
-from user_management.auth.auth import get_current_user
+from user_management.auth.auth import Principal, get_current_principal, get_current_user
+from user_management.auth.schemas import UserRead
+from user_management.responses import FastJSONResponse, json_dumps
 from fastapi.logger import logger
 
 router = APIRouter()
 
-@router.get("/me", summary="Получить данные текущего пользователя")
+@router.get("/me", response_model=UserRead, summary="Получить данные текущего пользователя")
 async def read_users_me(current_user: User = Depends(get_current_user)):
-    # Логирование для отладки
-    logger.debug("Вход в маршрут /me с current_user: %s", current_user)
-    logger.debug("Маршрут /me: current_user передан как: %s", current_user)
-    logger.info("Текущий пользователь: %s", current_user)
-
     if not isinstance(current_user, User):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Не удалось получить текущего пользователя"
         )
-    return {
-        "id": current_user.id,
-        "email": current_user.email,
-        "username": current_user.username,
-        "full_name": current_user.full_name,
-        "is_active": current_user.is_active,
-        "is_superuser": current_user.is_superuser,
-        "is_verified": current_user.is_verified,
-    }
+    logger.debug("Маршрут /me: текущий пользователь %s", current_user.id)
+    # UserRead собирается из атрибутов ORM-объекта и отбрасывает hashed_password
+    return current_user
+
+# Колонки, которые отдаются в списке пользователей (без загрузки ORM-сущностей); совпадают с полями UserRead
+USER_LIST_COLUMNS = (
+    User.id,
+    User.email,
+    User.username,
+    User.full_name,
+    User.is_active,
+    User.is_superuser,
+    User.is_verified,
+)
+
+def build_users_query(
+    after: Optional[int] = None,
+    is_active: Optional[bool] = None,
+    is_verified: Optional[bool] = None,
+    role_id: Optional[int] = None,
+):
+    """
+    Строит keyset-запрос по id с необязательными фильтрами.
+    """
+    query = select(*USER_LIST_COLUMNS).order_by(User.id)
+    if after is not None:
+        query = query.where(User.id > after)
+    if is_active is not None:
+        query = query.where(User.is_active == is_active)
+    if is_verified is not None:
+        query = query.where(User.is_verified == is_verified)
+    if role_id is not None:
+        query = query.where(User.role_id == role_id)
+    return query
+
+async def stream_users_ndjson(query):
+    """
+    Построчно отдаёт пользователей в формате NDJSON.
+    Сессия открывается внутри генератора, так как зависимость get_db
+    закрывается до начала отправки потокового ответа.
+    """
+    async with async_session_maker() as session:
+        result = await session.stream(query)
+        async for row in result:
+            yield json_dumps(row._asdict()) + b"\n"
 
-@router.get("/", summary="Получить список пользователей")
-async def get_users(db: AsyncSession = Depends(get_db)):
+@router.get("/", response_model=List[UserRead], summary="Получить список пользователей")
+async def get_users(
+    limit: int = Query(100, ge=1, le=1000, description="Размер страницы"),
+    after: Optional[int] = Query(None, description="Курсор: id последнего пользователя предыдущей страницы"),
+    is_active: Optional[bool] = None,
+    is_verified: Optional[bool] = None,
+    role_id: Optional[int] = None,
+    stream: bool = Query(False, description="Отдать всех пользователей потоком NDJSON без пагинации"),
+    # Read-only: вызывающий проверяется по claims токена, без загрузки пользователя из БД
+    principal: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db),
+):
+    query = build_users_query(after, is_active, is_verified, role_id)
+    if stream:
+        return StreamingResponse(stream_users_ndjson(query), media_type="application/x-ndjson")
     try:
-        query = select(User)
-        result = await db.execute(query)
-        users = result.scalars().all()
-        return [
-            {
-                "id": user.id,
-                "email": user.email,
-                "username": user.username,
-                "full_name": user.full_name,
-                "is_active": user.is_active,
-                "is_superuser": user.is_superuser,
-                "is_verified": user.is_verified,
-            }
-            for user in users
-        ]
+        result = await db.execute(query.limit(limit))
+        users = [row._asdict() for row in result]
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Ошибка при получении пользователей: {str(e)}"
         )
+    # Строки из select по колонкам уже типизированы: отдаём без поэлементной валидации UserRead.
+    # Курсор следующей страницы передаётся в заголовке, тело остаётся списком
+    headers = {"X-Next-After": str(users[-1]["id"])} if len(users) == limit else None
+    return FastJSONResponse(users, headers=headers)
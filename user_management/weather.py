@@ -1,25 +1,326 @@
-from fastapi import APIRouter, Depends, HTTPException
+import json
+import logging
+from datetime import datetime, timezone
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from pydantic import ValidationError
+from sqlalchemy import and_, func, insert, or_, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from user_management.dependencies import get_db
-from user_management.models.weather import Weather
-from user_management.schemas.weather import WeatherCreate, WeatherResponse
+from user_management.cache import create_cache_backend
+from user_management.config import settings
+from user_management.dependencies import async_session_maker, get_db
+from user_management.models.weather import Weather, utcnow
+from user_management.openweather import OpenWeatherError, SingleFlight, openweather_client
+from user_management.responses import FastJSONResponse
+from user_management.schemas.weather import WeatherCreate, WeatherResponse, WeatherBulkResult, WeatherStatsResponse
+from user_management.weather_stats import weather_stats
+from user_management.weather_refresher import CityPopularity, WeatherRefresher
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# Кэш последних данных о погоде по городу (read-through на GET, write-through на POST)
+weather_cache = create_cache_backend(
+    settings.WEATHER_CACHE_BACKEND,
+    maxsize=settings.WEATHER_CACHE_MAXSIZE,
+    ttl=settings.WEATHER_CACHE_TTL,
+)
+
+# Одновременные промахи по одному городу ждут один запрос к OpenWeather
+live_fetches = SingleFlight()
+
+async def _fetch_and_store(city: str) -> Optional[dict]:
+    observation = await openweather_client.current_weather(city)
+    if observation is None:
+        return None
+    async with async_session_maker() as session:
+        weather = Weather(**observation)
+        session.add(weather)
+        await session.commit()
+    data = WeatherResponse.model_validate(weather).model_dump(mode="json")
+    await weather_cache.set(city, data)
+    return data
+
+async def refresh_city_weather(city: str) -> Optional[dict]:
+    """
+    Запрашивает живую погоду, сохраняет её в weather и кладёт в кэш.
+    Возвращает данные в формате WeatherResponse или None, если город неизвестен OpenWeather.
+    """
+    return await live_fetches.do(city, lambda: _fetch_and_store(city))
+
+# Популярность городов для фонового обновления (учитываются и попадания в кэш)
+city_popularity = CityPopularity(half_life=settings.WEATHER_POPULARITY_HALF_LIFE)
+weather_refresher = WeatherRefresher(
+    city_popularity,
+    refresh_city_weather,
+    top_n=settings.WEATHER_REFRESH_TOP_N,
+    interval=settings.WEATHER_REFRESH_INTERVAL,
+    period=settings.WEATHER_LIVE_MAX_AGE - settings.WEATHER_REFRESH_AHEAD,
+    jitter=settings.WEATHER_REFRESH_JITTER,
+    budget_per_minute=settings.WEATHER_REFRESH_BUDGET_PER_MINUTE,
+)
 
 @router.post("/", response_model=WeatherResponse, summary="Добавить данные о погоде")
 async def create_weather(weather: WeatherCreate, db: AsyncSession = Depends(get_db)):
-    new_weather = Weather(**weather.dict())
+    new_weather = Weather(**weather.dict(exclude_none=True))
     db.add(new_weather)
     await db.commit()
     await db.refresh(new_weather)
+    if weather.observed_at is None:
+        # Наблюдение "на сейчас" заведомо самое свежее — кладём его в кэш
+        await weather_cache.set(new_weather.city, WeatherResponse.model_validate(new_weather).model_dump(mode="json"))
+    else:
+        await weather_cache.invalidate(new_weather.city)
     return new_weather
 
+async def iter_bulk_items(request: Request):
+    """
+    Отдаёт пары (номер строки, элемент) из тела запроса.
+    NDJSON читается потоком построчно, иначе тело разбирается как JSON-массив.
+    """
+    if "ndjson" in request.headers.get("content-type", ""):
+        index = 0
+        buffer = b""
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    yield index, line
+                    index += 1
+        if buffer.strip():
+            yield index, buffer
+        return
+    try:
+        items = json.loads(await request.body())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Некорректный JSON")
+    if not isinstance(items, list):
+        raise HTTPException(status_code=400, detail="Ожидается JSON-массив объектов")
+    for index, item in enumerate(items):
+        yield index, item
+
+def format_validation_error(exc: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" if err["loc"] else err["msg"]
+        for err in exc.errors()
+    )
+
+async def write_weather_chunk(db: AsyncSession, chunk: list, upsert: bool) -> tuple:
+    """
+    Записывает пачку строк одной транзакцией. Возвращает (вставлено, обновлено, схлопнуто).
+    В режиме upsert из строк одного города в пачке берётся самое новое наблюдение
+    (остальные считаются схлопнутыми). Оно заменяет последнюю запись города, только если
+    не старше её; более старое наблюдение добавляется в историю, а не затирает текущее.
+    """
+    if upsert:
+        rows_by_city = {}
+        for _, row in chunk:
+            current = rows_by_city.get(row["city"])
+            if current is None or as_utc(row["observed_at"]) >= as_utc(current["observed_at"]):
+                rows_by_city[row["city"]] = row
+        # Последнее наблюдение по городу — по индексу (city, observed_at DESC), а не по max(id):
+        # догруженные задним числом строки имеют больший id, но не являются последними
+        ranked = (
+            select(
+                Weather.city,
+                Weather.id,
+                Weather.observed_at,
+                func.row_number().over(
+                    partition_by=Weather.city,
+                    order_by=(Weather.observed_at.desc(), Weather.id.desc()),
+                ).label("position"),
+            )
+            .where(Weather.city.in_(rows_by_city))
+            .subquery()
+        )
+        latest = select(ranked.c.city, ranked.c.id, ranked.c.observed_at).where(ranked.c.position == 1)
+        existing = {city: (weather_id, observed_at) for city, weather_id, observed_at in await db.execute(latest)}
+        inserts, updates = [], []
+        for city, row in rows_by_city.items():
+            stored = existing.get(city)
+            if stored is not None and as_utc(row["observed_at"]) >= as_utc(stored[1]):
+                updates.append({"id": stored[0], **row})
+            else:
+                inserts.append(row)
+        collapsed = len(chunk) - len(rows_by_city)
+    else:
+        inserts = [row for _, row in chunk]
+        updates = []
+        collapsed = 0
+    if inserts:
+        await db.execute(insert(Weather), inserts)
+    if updates:
+        await db.execute(update(Weather), updates)
+    await db.commit()
+    return len(inserts), len(updates), collapsed
+
+@router.post("/bulk", response_model=WeatherBulkResult, summary="Пакетная загрузка данных о погоде")
+async def create_weather_bulk(request: Request, upsert: bool = False, db: AsyncSession = Depends(get_db)):
+    """
+    Принимает JSON-массив или NDJSON-поток объектов WeatherCreate.
+    Невалидные строки попадают в errors и не прерывают загрузку.
+    """
+    received = inserted = updated = collapsed = 0
+    errors = []
+    chunk = []
+
+    async def flush():
+        nonlocal inserted, updated, collapsed
+        try:
+            chunk_inserted, chunk_updated, chunk_collapsed = await write_weather_chunk(db, chunk, upsert)
+        except Exception:
+            await db.rollback()
+            # Текст ошибки драйвера (SQL, параметры) остаётся в логе сервера, клиенту — общее сообщение
+            logger.exception("Не удалось записать пачку погоды (строки %s–%s)", chunk[0][0], chunk[-1][0])
+            errors.extend({"index": index, "error": "Не удалось сохранить строку"} for index, _ in chunk)
+        else:
+            inserted += chunk_inserted
+            updated += chunk_updated
+            collapsed += chunk_collapsed
+            for city in {row["city"] for _, row in chunk}:
+                await weather_cache.invalidate(city)
+        chunk.clear()
+
+    async for index, item in iter_bulk_items(request):
+        received += 1
+        try:
+            if isinstance(item, (bytes, str)):
+                weather = WeatherCreate.model_validate_json(item)
+            else:
+                weather = WeatherCreate.model_validate(item)
+        except ValidationError as e:
+            errors.append({"index": index, "error": format_validation_error(e)})
+            continue
+        row = weather.model_dump()
+        if row["observed_at"] is None:
+            row["observed_at"] = utcnow()
+        chunk.append((index, row))
+        if len(chunk) >= settings.WEATHER_BULK_CHUNK_SIZE:
+            await flush()
+    if chunk:
+        await flush()
+
+    return {
+        "received": received,
+        "inserted": inserted,
+        "updated": updated,
+        "collapsed": collapsed,
+        "failed": len(errors),
+        "errors": errors,
+    }
+
+@router.get("/cache/stats", summary="Статистика кэша погоды")
+async def get_weather_cache_stats():
+    return weather_cache.stats()
+
+@router.get("/stats", response_model=WeatherStatsResponse, summary="Статистика температуры и влажности")
+async def get_weather_stats(
+    city: Optional[str] = Query(None, description="Только указанный город"),
+    since: Optional[datetime] = Query(None, description="Начало интервала (включительно)"),
+    until: Optional[datetime] = Query(None, description="Конец интервала (не включительно)"),
+    by_city: bool = Query(True, description="Группировать по городам; false — один агрегат по всем"),
+    percentiles: List[float] = Query([50, 90, 99], description="Перцентили (0–100)"),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    min/max/mean и перцентили считаются в БД или по колонкам без построения ORM-объектов.
+    """
+    if any(not 0 <= q <= 100 for q in percentiles):
+        raise HTTPException(status_code=400, detail="Перцентили должны быть в диапазоне 0–100")
+    since = as_utc(since) if since is not None else None
+    until = as_utc(until) if until is not None else None
+    stats = await weather_stats(db, city=city, since=since, until=until, by_city=by_city, percentiles=percentiles)
+    return {"since": since, "until": until, "stats": stats}
+
 @router.get("/{city}", response_model=WeatherResponse, summary="Получить данные о погоде по городу")
 async def get_weather(city: str, db: AsyncSession = Depends(get_db)):
-    query = select(Weather).filter(Weather.city == city)
+    if settings.WEATHER_REFRESHER_ENABLED:
+        city_popularity.record(city)
+    # Кэш хранит уже проверенный WeatherResponse в JSON-виде: отдаётся без повторной валидации
+    cached = await weather_cache.get(city)
+    if cached is not None:
+        return FastJSONResponse(cached)
+    # Последнее наблюдение по городу: одна запись по индексу (city, observed_at DESC)
+    query = select(Weather).filter(Weather.city == city).order_by(Weather.observed_at.desc()).limit(1)
     result = await db.execute(query)
     weather = result.scalars().first()
-    if not weather:
+    data = WeatherResponse.model_validate(weather).model_dump(mode="json") if weather else None
+    if settings.WEATHER_LIVE_FETCH_ENABLED and (
+        weather is None or (utcnow() - as_utc(weather.observed_at)).total_seconds() > settings.WEATHER_LIVE_MAX_AGE
+    ):
+        # Соединение возвращается в пул до запроса к внешнему API,
+        # иначе сотни ожидающих запросов держат весь пул и запись результата не получит соединения
+        await db.close()
+        try:
+            live = await refresh_city_weather(city)
+        except OpenWeatherError as e:
+            # Недоступность API не ломает ответ, если есть сохранённые данные
+            logger.warning("Не удалось получить погоду для %s: %s", city, e)
+            live = None
+        if live is not None:
+            return FastJSONResponse(live)
+    if data is None:
         raise HTTPException(status_code=404, detail="Данные о погоде не найдены")
-    return weather
\ No newline at end of file
+    await weather_cache.set(city, data)
+    return FastJSONResponse(data)
+
+def as_utc(value: datetime) -> datetime:
+    """
+    Приводит время к UTC; время без часового пояса считается UTC.
+    """
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+def parse_history_cursor(cursor: str) -> tuple:
+    try:
+        observed_at, weather_id = cursor.rsplit("|", 1)
+        return as_utc(datetime.fromisoformat(observed_at)), int(weather_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Некорректный курсор")
+
+@router.get("/{city}/history", response_model=List[WeatherResponse], summary="История наблюдений погоды по городу")
+async def get_weather_history(
+    city: str,
+    since: Optional[datetime] = Query(None, description="Начало интервала (включительно)"),
+    until: Optional[datetime] = Query(None, description="Конец интервала (не включительно)"),
+    limit: int = Query(100, ge=1, le=1000, description="Размер страницы"),
+    before: Optional[str] = Query(None, description="Курсор из заголовка X-Next-Before предыдущей страницы"),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Отдаёт наблюдения от новых к старым с keyset-пагинацией по (observed_at, id).
+    """
+    # Select по колонкам WeatherResponse: без ORM-объектов и поэлементной валидации
+    query = (
+        select(
+            Weather.id,
+            Weather.city,
+            Weather.temperature,
+            Weather.humidity,
+            Weather.description,
+            Weather.observed_at,
+        )
+        .filter(Weather.city == city)
+        .order_by(Weather.observed_at.desc(), Weather.id.desc())
+        .limit(limit)
+    )
+    if since is not None:
+        query = query.filter(Weather.observed_at >= as_utc(since))
+    if until is not None:
+        query = query.filter(Weather.observed_at < as_utc(until))
+    if before is not None:
+        observed_at, weather_id = parse_history_cursor(before)
+        query = query.filter(or_(
+            Weather.observed_at < observed_at,
+            and_(Weather.observed_at == observed_at, Weather.id < weather_id),
+        ))
+    result = await db.execute(query)
+    rows = [row._asdict() for row in result]
+    headers = None
+    if len(rows) == limit:
+        last = rows[-1]
+        headers = {"X-Next-Before": f"{last['observed_at'].isoformat()}|{last['id']}"}
+    return FastJSONResponse(rows, headers=headers)
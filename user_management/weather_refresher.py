@@ -0,0 +1,148 @@
+# weather_refresher.py
+"""
+Фоновое обновление погоды для популярных городов.
+
+Частота запросов по городам учитывается с экспоненциальным затуханием; раз в
+тик планировщик берёт top-N городов и заранее обновляет те, у которых подходит
+срок (WEATHER_LIVE_MAX_AGE минус запас, со случайным сдвигом, чтобы города не
+обновлялись одной пачкой). Общее число запросов к OpenWeather ограничено бюджетом
+в минуту (token bucket).
+"""
+import asyncio
+import heapq
+import logging
+import random
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from user_management.metrics import weather_refreshes
+
+logger = logging.getLogger(__name__)
+
+
+class CityPopularity:
+    """
+    Счётчики запросов по городам с периодом полураспада half_life секунд.
+    """
+
+    def __init__(self, half_life: float, maxsize: int = 10000):
+        self.half_life = half_life
+        self.maxsize = maxsize
+        # город -> [счёт, время последнего обновления]
+        self._scores: Dict[str, list] = {}
+
+    def _decayed(self, item: list, now: float) -> float:
+        return item[0] * 0.5 ** ((now - item[1]) / self.half_life)
+
+    def record(self, city: str, now: Optional[float] = None) -> None:
+        now = time.monotonic() if now is None else now
+        item = self._scores.get(city)
+        if item is None:
+            if len(self._scores) >= self.maxsize:
+                self._prune(now)
+            self._scores[city] = [1.0, now]
+        else:
+            item[0] = self._decayed(item, now) + 1.0
+            item[1] = now
+
+    def _prune(self, now: float) -> None:
+        # Оставляем более популярную половину
+        keep = self.top(self.maxsize // 2, now)
+        self._scores = {city: self._scores[city] for city in keep}
+
+    def top(self, n: int, now: Optional[float] = None) -> List[str]:
+        now = time.monotonic() if now is None else now
+        return heapq.nlargest(n, self._scores, key=lambda city: self._decayed(self._scores[city], now))
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+
+class TokenBucket:
+    """
+    Глобальный бюджет запросов: rate токенов в минуту, не больше capacity в запасе.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def take(self, now: Optional[float] = None) -> bool:
+        now = time.monotonic() if now is None else now
+        self.tokens = min(self.capacity, self.tokens + max(0.0, now - self.updated) * self.rate)
+        self.updated = max(self.updated, now)
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return True
+        return False
+
+
+class WeatherRefresher:
+    """
+    Планировщик фонового обновления. refresh — корутина обновления одного города
+    (weather.refresh_city_weather, общий single-flight с запросами пользователей).
+    """
+
+    def __init__(self, popularity: CityPopularity, refresh: Callable[[str], Awaitable[object]],
+                 top_n: int, interval: float, period: float, jitter: float, budget_per_minute: float):
+        self.popularity = popularity
+        self.refresh = refresh
+        self.top_n = top_n
+        self.interval = interval
+        self.period = period
+        self.jitter = jitter
+        self.budget = TokenBucket(budget_per_minute)
+        self._next_due: Dict[str, float] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    async def run_once(self, now: Optional[float] = None) -> List[str]:
+        """
+        Один тик: обновляет города из top-N, у которых наступил срок. Возвращает обновлённые города.
+        """
+        now = time.monotonic() if now is None else now
+        refreshed = []
+        for city in self.popularity.top(self.top_n, now):
+            if self._next_due.get(city, 0.0) > now:
+                continue
+            if not self.budget.take(now):
+                weather_refreshes.inc("budget_exhausted")
+                break
+            try:
+                await self.refresh(city)
+            except Exception as e:
+                # Ошибка одного города не останавливает планировщик; повтор — на следующем сроке
+                logger.warning("Фоновое обновление погоды для %s не удалось: %s", city, e)
+                weather_refreshes.inc("error")
+            else:
+                weather_refreshes.inc("ok")
+                refreshed.append(city)
+            self._next_due[city] = now + max(self.interval, self.period - random.uniform(0, self.jitter))
+        # Города, выпавшие из топа, не держим в расписании
+        if len(self._next_due) > self.top_n * 4:
+            hot = set(self.popularity.top(self.top_n, now))
+            self._next_due = {city: due for city, due in self._next_due.items() if city in hot}
+        return refreshed
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval * random.uniform(0.8, 1.2))
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception("Ошибка фонового обновления погоды")
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop(), name="weather-refresher")
+            logger.info("Фоновое обновление погоды запущено: top %s городов", self.top_n)
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,145 @@
+# weather_stats.py
+"""
+Агрегаты погоды: min/max/mean и перцентили температуры и влажности
+по городам или по всем городам за интервал времени.
+
+min/max/mean и количество считает БД (GROUP BY). Перцентили на PostgreSQL
+считаются там же (percentile_cont), на остальных СУБД колонки читаются
+потоком пачками кортежей (без ORM-объектов) в компактные массивы array('d').
+"""
+from array import array
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from sqlalchemy import func, null
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from user_management.models.weather import Weather
+
+METRICS = ("temperature", "humidity")
+STREAM_BATCH_SIZE = 10000
+ALL_CITIES = None
+
+
+def percentile_key(q: float) -> str:
+    return f"p{q:g}"
+
+
+def python_percentiles(values: Sequence[float], percentiles: Sequence[float]) -> List[float]:
+    """
+    Перцентили с линейной интерполяцией (метод linear, как percentile_cont в PostgreSQL).
+    """
+    ordered = sorted(values)
+    last = len(ordered) - 1
+    result = []
+    for q in percentiles:
+        position = last * q / 100.0
+        lower = int(position)
+        upper = min(lower + 1, last)
+        result.append(ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower))
+    return result
+
+
+def compute_percentiles(values: array, percentiles: Sequence[float]) -> List[float]:
+    if not values or not percentiles:
+        return [None] * len(percentiles)
+    return python_percentiles(values, percentiles)
+
+
+def _filters(city: Optional[str], since: Optional[datetime], until: Optional[datetime]) -> list:
+    conditions = []
+    if city is not None:
+        conditions.append(Weather.city == city)
+    if since is not None:
+        conditions.append(Weather.observed_at >= since)
+    if until is not None:
+        conditions.append(Weather.observed_at < until)
+    return conditions
+
+
+def _group_column(by_city: bool):
+    # null(), а не literal(None): нетипизированный bind-параметр ломает GROUP BY на asyncpg
+    return Weather.city if by_city else null().label("city")
+
+
+async def _sql_aggregates(db: AsyncSession, conditions: list, by_city: bool) -> Dict[Optional[str], dict]:
+    group = _group_column(by_city)
+    columns = [group, func.count(Weather.id)]
+    for name in METRICS:
+        column = getattr(Weather, name)
+        columns += [func.min(column), func.max(column), func.avg(column)]
+    query = select(*columns).where(*conditions)
+    if by_city:
+        query = query.group_by(Weather.city).order_by(Weather.city)
+    stats = {}
+    for row in (await db.execute(query)).all():
+        city, count = row[0], row[1]
+        if not count:
+            continue
+        item = {"city": city, "count": count}
+        for i, name in enumerate(METRICS):
+            minimum, maximum, mean = row[2 + i * 3: 5 + i * 3]
+            item[name] = {"min": float(minimum), "max": float(maximum), "mean": float(mean), "percentiles": {}}
+        stats[city] = item
+    return stats
+
+
+async def _sql_percentiles(db: AsyncSession, conditions: list, by_city: bool,
+                           percentiles: Sequence[float]) -> Dict[Optional[str], dict]:
+    group = _group_column(by_city)
+    columns = [group]
+    for name in METRICS:
+        column = getattr(Weather, name)
+        columns += [func.percentile_cont(q / 100.0).within_group(column) for q in percentiles]
+    query = select(*columns).where(*conditions)
+    if by_city:
+        query = query.group_by(Weather.city)
+    result = {}
+    for row in (await db.execute(query)).all():
+        values = iter(row[1:])
+        result[row[0]] = {name: [next(values) for _ in percentiles] for name in METRICS}
+    return result
+
+
+async def _streamed_percentiles(db: AsyncSession, conditions: list, by_city: bool,
+                                percentiles: Sequence[float]) -> Dict[Optional[str], dict]:
+    # Колонки копятся в array('d') — 8 байт на значение вместо объекта float
+    columns: Dict[Optional[str], Dict[str, array]] = defaultdict(lambda: {name: array("d") for name in METRICS})
+    query = select(Weather.city, Weather.temperature, Weather.humidity).where(*conditions)
+    stream = await db.stream(query.execution_options(yield_per=STREAM_BATCH_SIZE))
+    async for batch in stream.partitions(STREAM_BATCH_SIZE):
+        for city, temperature, humidity in batch:
+            target = columns[city if by_city else ALL_CITIES]
+            target["temperature"].append(temperature)
+            target["humidity"].append(humidity)
+    return {
+        city: {name: compute_percentiles(values[name], percentiles) for name in METRICS}
+        for city, values in columns.items()
+    }
+
+
+async def weather_stats(db: AsyncSession, city: Optional[str] = None, since: Optional[datetime] = None,
+                        until: Optional[datetime] = None, by_city: bool = True,
+                        percentiles: Iterable[float] = (50, 90, 99)) -> List[dict]:
+    """
+    Возвращает список агрегатов (по городу или один общий элемент с city=None).
+    """
+    percentiles = list(percentiles)
+    conditions = _filters(city, since, until)
+    stats = await _sql_aggregates(db, conditions, by_city)
+    if not stats or not percentiles:
+        return list(stats.values())
+    if db.get_bind().dialect.name == "postgresql":
+        computed = await _sql_percentiles(db, conditions, by_city, percentiles)
+    else:
+        computed = await _streamed_percentiles(db, conditions, by_city, percentiles)
+    for key, item in stats.items():
+        for name in METRICS:
+            values = computed.get(key, {}).get(name, [None] * len(percentiles))
+            item[name]["percentiles"] = {
+                percentile_key(q): float(value) if value is not None else None
+                for q, value in zip(percentiles, values)
+            }
+    return list(stats.values())